@@ -0,0 +1,215 @@
+"""Headless JSON API for the game.
+
+Serves the same flow as `app/game.py` without Streamlit. Templates and
+entities are loaded once into a shared catalog, player sessions only hold
+their selections, so requests never touch the database.
+
+Run with `uvicorn app.api:app` from the project root.
+"""
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from project_muse.db import init_db
+from project_muse.scene import Scene
+from project_muse.template.records import EntityRecord, TemplateRecord, load_entity_records, load_template_records
+from project_muse.template.scene import SceneTemplateTag
+from project_muse.types import EntityType
+from .types import SelectionState, get_sentence_orders
+
+class Catalog:
+    """Scene templates and entities loaded once and shared by every session"""
+
+    def __init__(self):
+        self.templates: dict[str, TemplateRecord] = {}
+        self.entities: dict[str, EntityRecord] = {}
+        self.entities_by_type: dict[EntityType, list[EntityRecord]] = {}
+
+    def load(self):
+        """Replace the catalog with the current database contents, as read-only records"""
+        templates = {template.name: template for template in load_template_records()}
+        entities = {entity.name: entity for entity in load_entity_records()}
+        entities_by_type = {entity_type: [] for entity_type in EntityType}
+        for entity in entities.values():
+            entities_by_type[entity.entity_type].append(entity)
+        # Swap in one step so in-flight requests see either catalog, never a mix
+        self.templates, self.entities, self.entities_by_type = templates, entities, entities_by_type
+
+class PlayerSession:
+    """A player's selections for one scene template"""
+
+    def __init__(self, template: TemplateRecord):
+        self.template = template
+        self.tags: dict[str, SceneTemplateTag] = {tag.tag_name: tag for tag in template.get_template_tags()}
+        # Records never change, so the orders are worked out once per session
+        self.sentence_orders = get_sentence_orders(template)
+        self.selection_state = SelectionState({}, {}, None)
+
+    def get_options(self, tag: SceneTemplateTag, catalog: Catalog) -> list[EntityRecord]:
+        """Entities that can fill the tag, the tag's current entity stays available"""
+        used = self.selection_state.used_entities.get(tag.entity_type.value, set())
+        current = self.selection_state.selections.get(tag.tag_name)
+        current_name = current[1].name if current else None
+        return [
+            entity for entity in catalog.entities_by_type.get(tag.entity_type, [])
+            if entity.name not in used or entity.name == current_name
+        ]
+
+    def select(self, tag: SceneTemplateTag, entity: EntityRecord):
+        """Fill a tag, replacing any entity it already had along with its downstream selections"""
+        self.selection_state.replace_selection(tag, entity, self.sentence_orders)
+
+    def get_scene(self) -> Scene:
+        scene = Scene(self.template)
+        for tag, entity in self.selection_state.selections.values():
+            scene.create_entity_by_tag(tag, entity)
+        return scene
+
+    def to_dict(self, session_id: str) -> dict:
+        return {
+            'session_id': session_id,
+            'template': self.template.name,
+            'selections': {
+                tag_name: entity.name
+                for tag_name, (tag, entity) in self.selection_state.selections.items()
+            },
+            'preview': self.get_scene().get_filled_description(),
+        }
+
+def template_to_dict(template: TemplateRecord) -> dict:
+    return {
+        'name': template.name,
+        'sentences': [
+            {
+                'order': sentence.order,
+                'text': sentence.text,
+                'tags': [str(tag) for tag in sentence.template_tags],
+            }
+            for sentence in template.sentences
+        ],
+    }
+
+def entity_to_dict(entity: EntityRecord) -> dict:
+    return {
+        'name': entity.name,
+        'entity_type': entity.entity_type.value,
+        'description': entity.description,
+        'possible_states': list(entity.possible_states),
+    }
+
+def create_app(connect: Callable[[], None] = init_db) -> Starlette:
+    """Create the API, `connect` is called once at startup to set up the database"""
+    catalog = Catalog()
+    sessions: dict[str, PlayerSession] = {}
+
+    # Helpers
+    async def read_json(request: Request) -> dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPException(400, "Request body must be a JSON object")
+        return body
+
+    def get_session(request: Request) -> tuple[str, PlayerSession]:
+        session_id = request.path_params['session_id']
+        if session_id not in sessions:
+            raise HTTPException(404, f"Unknown session {session_id}")
+        return session_id, sessions[session_id]
+
+    def get_tag(session: PlayerSession, request: Request) -> SceneTemplateTag:
+        tag_name = request.path_params['tag_name']
+        if tag_name not in session.tags:
+            raise HTTPException(404, f"Template {session.template.name} has no tag {tag_name}")
+        return session.tags[tag_name]
+
+    # Endpoints
+    async def list_templates(request: Request):
+        return JSONResponse([template_to_dict(t) for t in catalog.templates.values()])
+
+    async def get_template(request: Request):
+        name = request.path_params['name']
+        if name not in catalog.templates:
+            raise HTTPException(404, f"Unknown template {name}")
+        return JSONResponse(template_to_dict(catalog.templates[name]))
+
+    async def reload_catalog(request: Request):
+        await asyncio.to_thread(catalog.load)
+        return JSONResponse({'templates': len(catalog.templates), 'entities': len(catalog.entities)})
+
+    async def create_session(request: Request):
+        body = await read_json(request)
+        template = catalog.templates.get(body.get('template'))
+        if template is None:
+            raise HTTPException(404, f"Unknown template {body.get('template')}")
+        session_id = uuid.uuid4().hex
+        sessions[session_id] = PlayerSession(template)
+        return JSONResponse(sessions[session_id].to_dict(session_id), status_code=201)
+
+    async def get_session_state(request: Request):
+        session_id, session = get_session(request)
+        return JSONResponse(session.to_dict(session_id))
+
+    async def delete_session(request: Request):
+        session_id, _ = get_session(request)
+        del sessions[session_id]
+        return Response(status_code=204)
+
+    async def get_options(request: Request):
+        _, session = get_session(request)
+        tag = get_tag(session, request)
+        return JSONResponse([entity_to_dict(e) for e in session.get_options(tag, catalog)])
+
+    async def put_selection(request: Request):
+        session_id, session = get_session(request)
+        tag = get_tag(session, request)
+        body = await read_json(request)
+        entity: Optional[EntityRecord] = catalog.entities.get(body.get('entity'))
+        if entity is None:
+            raise HTTPException(404, f"Unknown entity {body.get('entity')}")
+        if not tag.is_valid_option(entity):
+            raise HTTPException(400, f"{entity} cannot fill {tag}")
+        if entity not in session.get_options(tag, catalog):
+            raise HTTPException(409, f"{entity.name} is already used in this scene")
+        session.select(tag, entity)
+        return JSONResponse(session.to_dict(session_id))
+
+    async def delete_selection(request: Request):
+        session_id, session = get_session(request)
+        tag = get_tag(session, request)
+        session.selection_state.remove_selection(tag.tag_name)
+        return JSONResponse(session.to_dict(session_id))
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        await asyncio.to_thread(connect)
+        await asyncio.to_thread(catalog.load)
+        yield
+
+    app = Starlette(
+        routes=[
+            Route('/templates', list_templates),
+            Route('/templates/{name}', get_template),
+            Route('/catalog/reload', reload_catalog, methods=['POST']),
+            Route('/sessions', create_session, methods=['POST']),
+            Route('/sessions/{session_id}', get_session_state),
+            Route('/sessions/{session_id}', delete_session, methods=['DELETE']),
+            Route('/sessions/{session_id}/options/{tag_name}', get_options),
+            Route('/sessions/{session_id}/selections/{tag_name}', put_selection, methods=['PUT']),
+            Route('/sessions/{session_id}/selections/{tag_name}', delete_selection, methods=['DELETE']),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.catalog = catalog
+    app.state.sessions = sessions
+    return app
+
+app = create_app()
@@ -1,18 +1,88 @@
 import streamlit as st
 from project_muse.db import init_db
+from project_muse.template.bulk import apply_entity_edits, bulk_insert_entities, bulk_insert_file, diff_grid, STATE_SEPARATOR
+from project_muse.template.migration import build_sentences
 from project_muse.template.scene import SceneTemplate
-from project_muse.entity.template import (
-    CharacterTemplate, 
-    ObjectPropTemplate, 
-    LandmarkTemplate,
-    EntityType,
-    CreatureTemplate
-)
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.states import vocabulary
+from project_muse.types import EntityType
 
 def init():
     """Initialize the database connection"""
     init_db()
 
+GRID_TYPES = {
+    "Character": EntityType.CHARACTER,
+    "Object": EntityType.OBJECT_PROP,
+    "Landmark": EntityType.LANDMARK,
+    "Creature": EntityType.CREATURE,
+}
+
+def entity_grid(label: str, entity_type: EntityType):
+    """Editable grid of one entity type, saved as a single batch of changed fields"""
+    st.subheader(f"{label}s")
+    key = f"grid_{entity_type.value}"
+    documents = list(EntityTemplate._get_collection().find(
+        {'entity_type': entity_type.value},
+        {'name': 1, 'description': 1, 'possible_states': 1},
+    ).sort('name', 1))
+    rows = [
+        {
+            "_id": str(document['_id']),
+            "name": document['name'],
+            "description": document.get('description', ""),
+            "possible_states": STATE_SEPARATOR.join(vocabulary.get_names(document.get('possible_states', []))),
+        }
+        for document in documents
+    ]
+
+    # Rows carry their _id in a hidden column, changes are matched on it rather than row positions
+    edited_rows = st.data_editor(
+        rows, key=key, num_rows="dynamic", use_container_width=True, column_config={"_id": None}
+    )
+    changes = diff_grid(rows, edited_rows)
+
+    if st.button(f"Save {len(changes)} changes", key=f"{key}_save", disabled=not changes):
+        result = apply_entity_edits(changes)
+        added = bulk_insert_entities(
+            [{**row, "entity_type": entity_type.value} for row in changes.added]
+        )
+        errors = result.errors + added.errors
+        st.success(f"Updated {result.updated}, deleted {result.deleted}, created {added.inserted}")
+        for error in errors:
+            st.error(str(error))
+        if not errors:
+            del st.session_state[key]
+            st.rerun()
+
+def entity_forms(label: str, entity_type: EntityType):
+    """One update form per entity of a type"""
+    st.subheader(f"{label}s")
+    for entity in EntityTemplate.objects(entity_type=entity_type).order_by('name'):
+        with st.expander(f"{label}: {entity.name}"):
+            with st.form(f"{entity_type.value}_{entity.name}"):
+                new_name = st.text_input("Name", entity.name)
+                new_desc = st.text_input("Description", entity.description)
+
+                # Add states management
+                states_str = st.text_area(
+                    "Possible States (one per line)",
+                    "\n".join(entity.possible_states)
+                )
+
+                if st.form_submit_button("Update"):
+                    entity.name = new_name
+                    entity.description = new_desc
+                    # Parse states from text area
+                    entity.possible_states = [s.strip() for s in states_str.split('\n') if s.strip()]
+                    entity.save()
+                    st.success(f"{label} updated!")
+
+                if st.form_submit_button("Delete", type="secondary"):
+                    entity.delete()
+                    st.success(f"{label} deleted!")
+                    st.rerun()
+
 def main():
     st.title("Story Puzzle Editor")
     init()
@@ -20,7 +90,7 @@ def main():
     # Sidebar for navigation
     page = st.sidebar.selectbox(
         "Choose a page",
-        ["Browse Templates", "Add Template", "Browse Entities", "Add Entity"]
+        ["Browse Templates", "Add Template", "Browse Entities", "Add Entity", "Bulk Upload Entities"]
     )
 
     if page == "Browse Templates":
@@ -32,11 +102,11 @@ def main():
                 # Create a form for each template
                 with st.form(f"template_{template.name}"):
                     new_name = st.text_input("Name", template.name)
-                    new_description = st.text_area("Description", template.template_description)
+                    new_description = st.text_area("Description", template.get_full_template_description())
                     
                     if st.form_submit_button("Update"):
                         template.name = new_name
-                        template.template_description = new_description
+                        template.sentences = build_sentences(new_description)
                         template.save()
                         st.success("Template updated!")
                     
@@ -55,7 +125,7 @@ def main():
                 if name and description:
                     template = SceneTemplate(
                         name=name,
-                        template_description=description
+                        sentences=build_sentences(description)
                     ).save()
                     st.success(f"Created template: {template.name}")
                 else:
@@ -65,123 +135,26 @@ def main():
         st.header("Entities")
         entity_type = st.selectbox(
             "Filter by type",
-            ["All", "Character", "Object", "Landmark", "Creature"]
+            ["All", *GRID_TYPES]
         )
-        
-        if entity_type == "Character" or entity_type == "All":
-            st.subheader("Characters")
-            for entity in CharacterTemplate.objects.all():
-                with st.expander(f"Character: {entity.name}"):
-                    with st.form(f"character_{entity.name}"):
-                        new_name = st.text_input("Name", entity.name)
-                        new_desc = st.text_input("Description", entity.description)
-                        
-                        # Add states management
-                        states_str = st.text_area(
-                            "Possible States (one per line)", 
-                            "\n".join(entity.possible_states)
-                        )
-                        
-                        if st.form_submit_button("Update"):
-                            entity.name = new_name
-                            entity.description = new_desc
-                            # Parse states from text area
-                            entity.possible_states = [s.strip() for s in states_str.split('\n') if s.strip()]
-                            entity.save()
-                            st.success("Character updated!")
-                        
-                        if st.form_submit_button("Delete", type="secondary"):
-                            entity.delete()
-                            st.success("Character deleted!")
-                            st.rerun()
-        
-        if entity_type == "Object" or entity_type == "All":
-            st.subheader("Objects")
-            for entity in ObjectPropTemplate.objects.all():
-                with st.expander(f"Object: {entity.name}"):
-                    with st.form(f"object_{entity.name}"):
-                        new_name = st.text_input("Name", entity.name)
-                        new_desc = st.text_input("Description", entity.description)
-                        
-                        # Add states management
-                        states_str = st.text_area(
-                            "Possible States (one per line)", 
-                            "\n".join(entity.possible_states)
-                        )
-                        
-                        if st.form_submit_button("Update"):
-                            entity.name = new_name
-                            entity.description = new_desc
-                            # Parse states from text area
-                            entity.possible_states = [s.strip() for s in states_str.split('\n') if s.strip()]
-                            entity.save()
-                            st.success("Object updated!")
-                        
-                        if st.form_submit_button("Delete", type="secondary"):
-                            entity.delete()
-                            st.success("Object deleted!")
-                            st.rerun()
-        
-        if entity_type == "Landmark" or entity_type == "All":
-            st.subheader("Landmarks")
-            for entity in LandmarkTemplate.objects.all():
-                with st.expander(f"Landmark: {entity.name}"):
-                    with st.form(f"landmark_{entity.name}"):
-                        new_name = st.text_input("Name", entity.name)
-                        new_desc = st.text_input("Description", entity.description)
-                        
-                        # Add states management
-                        states_str = st.text_area(
-                            "Possible States (one per line)", 
-                            "\n".join(entity.possible_states)
-                        )
-                        
-                        if st.form_submit_button("Update"):
-                            entity.name = new_name
-                            entity.description = new_desc
-                            # Parse states from text area
-                            entity.possible_states = [s.strip() for s in states_str.split('\n') if s.strip()]
-                            entity.save()
-                            st.success("Landmark updated!")
-                        
-                        if st.form_submit_button("Delete", type="secondary"):
-                            entity.delete()
-                            st.success("Landmark deleted!")
-                            st.rerun()
-        
-        if entity_type == "Creature" or entity_type == "All":
-            st.subheader("Creatures")
-            for entity in CreatureTemplate.objects.all():
-                with st.expander(f"Creature: {entity.name}"):
-                    with st.form(f"creature_{entity.name}"):
-                        new_name = st.text_input("Name", entity.name)
-                        new_desc = st.text_input("Description", entity.description)
-                        
-                        # Add states management
-                        states_str = st.text_area(
-                            "Possible States (one per line)", 
-                            "\n".join(entity.possible_states)
-                        )
-                        
-                        if st.form_submit_button("Update"):
-                            entity.name = new_name
-                            entity.description = new_desc
-                            # Parse states from text area
-                            entity.possible_states = [s.strip() for s in states_str.split('\n') if s.strip()]
-                            entity.save()
-                            st.success("Creature updated!")
-                        
-                        if st.form_submit_button("Delete", type="secondary"):
-                            entity.delete()
-                            st.success("Creature deleted!")
-                            st.rerun()
+        grid_mode = st.toggle("Grid editing")
+
+        if grid_mode:
+            for label, grid_type in GRID_TYPES.items():
+                if entity_type == label or entity_type == "All":
+                    entity_grid(label, grid_type)
+
+        if not grid_mode:
+            for label, form_type in GRID_TYPES.items():
+                if entity_type == label or entity_type == "All":
+                    entity_forms(label, form_type)
 
     elif page == "Add Entity":
         st.header("Add New Entity")
         with st.form("new_entity"):
             entity_type = st.selectbox(
                 "Entity Type",
-                ["Character", "Object", "Landmark", "Creature"]
+                list(GRID_TYPES)
             )
             name = st.text_input("Name")
             description = st.text_input("Description")
@@ -197,33 +170,33 @@ def main():
                     # Parse states from text area
                     states = [s.strip() for s in states_str.split('\n') if s.strip()]
                     
-                    if entity_type == "Character":
-                        entity = CharacterTemplate(
-                            name=name, 
-                            description=description,
-                            possible_states=states
-                        ).save()
-                    elif entity_type == "Object":
-                        entity = ObjectPropTemplate(
-                            name=name, 
-                            description=description,
-                            possible_states=states
-                        ).save()
-                    elif entity_type == "Landmark":
-                        entity = LandmarkTemplate(
-                            name=name, 
-                            description=description,
-                            possible_states=states
-                        ).save()
-                    elif entity_type == "Creature":
-                        entity = CreatureTemplate(
-                            name=name, 
-                            description=description,
-                            possible_states=states
-                        ).save()
+                    EntityTemplate(
+                        name=name,
+                        entity_type=GRID_TYPES[entity_type],
+                        description=description,
+                        possible_states=states
+                    ).save()
                     st.success(f"Created {entity_type}: {name}")
                 else:
                     st.error("Please fill in the name field")
 
+    elif page == "Bulk Upload Entities":
+        st.header("Bulk Upload Entities")
+        st.write(
+            "CSV columns: `name`, `entity_type`, `description`, `possible_states` (separated by `|`). "
+            "NDJSON rows use the same keys with `possible_states` as a list."
+        )
+        uploaded = st.file_uploader("Entity file", type=["csv", "ndjson", "jsonl"])
+
+        if uploaded is not None and st.button("Upload"):
+            result = bulk_insert_file(uploaded.getvalue(), uploaded.name)
+            st.success(f"Created {result.inserted} entities")
+            if result.errors:
+                st.error(f"{len(result.errors)} rows failed")
+                st.dataframe(
+                    [{"Row": e.row, "Name": e.name, "Error": e.message} for e in result.errors],
+                    use_container_width=True,
+                )
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,62 +1,103 @@
+import uuid
 import streamlit as st
 from project_muse.db import init_db
+from project_muse.cache import DiskCache, ReadThroughCache
+from project_muse.scene.autofill import AutoFill
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.query import iter_templates
+from project_muse.template.records import LazyTemplate
 from project_muse.template.scene import SceneTemplate, SceneTemplateTag
 from project_muse.scene import Scene
-from project_muse.entity.template import (
-    CharacterTemplate, 
-    ObjectPropTemplate, 
-    LandmarkTemplate,
-    CreatureTemplate,
-    EntityType,
-    BaseEntityTemplate
+from app.types import SelectionState
+from app.src.callbacks import (
+    on_entity_change, on_template_change, on_undo, on_redo, get_scene_store, start_scene
 )
-from project_muse.ui.types import SelectionState
-from project_muse.ui.callbacks import on_entity_change, on_template_change
+
+# Sentences shown, and loaded, at a time
+SENTENCE_PAGE_SIZE = 10
 
 def init_app():
     """Initialize the database connection"""
     init_db()
 
+    # Players are identified through the URL so progress survives restarts
+    if 'player_id' not in st.session_state:
+        st.session_state.player_id = st.query_params.get("player") or uuid.uuid4().hex
+        st.query_params["player"] = st.session_state.player_id
+        restore_player()
+
     # Initialize session state for persistent objects
     if 'scene' not in st.session_state:
         st.session_state.scene = Scene(None)
     if 'template' not in st.session_state:
         st.session_state.template = None
     if 'selection_state' not in st.session_state:
-        st.session_state.selection_state = SelectionState({}, {}, None)
-
-def get_entity_options(entity_type: EntityType):
-    """Get all entities of a specific type from the database"""
-    if entity_type == EntityType.CHARACTER:
-        return CharacterTemplate.objects.all()
-    elif entity_type == EntityType.OBJECT_PROP:
-        return ObjectPropTemplate.objects.all()
-    elif entity_type == EntityType.LANDMARK:
-        return LandmarkTemplate.objects.all()
-    elif entity_type == EntityType.CREATURE:
-        return CreatureTemplate.objects.all()
-    return []
+        st.session_state.selection_state = SelectionState({}, {}, st.session_state.scene)
+
+def restore_player():
+    """Restore the player's last saved scene and selections, if any"""
+    scene = get_scene_store().load_scene(st.session_state.player_id)
+    if scene is None:
+        return
+    st.session_state.scene = scene
+    st.session_state.template = LazyTemplate(scene.scene_template.name, page_size=SENTENCE_PAGE_SIZE)
+    st.session_state.selection_state = SelectionState.from_scene(scene)
+    st.session_state.template_selector = scene.scene_template.name
+
+@st.cache_resource
+def get_document_cache() -> ReadThroughCache:
+    """On-disk cache so a restarted process renders without waiting on Mongo"""
+    return ReadThroughCache(DiskCache())
+
+def get_autofill() -> AutoFill:
+    """Ranking indexes over the whole entity catalog, rebuilt whenever the cached catalog changes"""
+    return build_autofill(get_document_cache().get_entry_version(EntityTemplate))
+
+@st.cache_resource(max_entries=1)
+def build_autofill(version: str) -> AutoFill:
+    """Built once per version of the cached catalog, `version` only keys the resource"""
+    return AutoFill(get_document_cache().get_records(EntityTemplate))
 
 def scene_template_selector():
     """Render the scene template selector"""
-    templates = SceneTemplate.objects.all()
-    template_names = [t.name for t in templates]
+    template_names = [t['name'] for t in get_document_cache().get(
+        SceneTemplate._get_collection_name(), "names", lambda: list(iter_templates(fields={'_id': 0, 'name': 1}))
+    )]
     selected_template_name = st.selectbox(
         "Choose a scene template:",
         options=template_names,
         key="template_selector",
         on_change=on_template_change
     )
-    st.session_state.template = SceneTemplate.objects(name=selected_template_name).first()
+    st.session_state.template = open_template(selected_template_name)
+
+def open_template(name: str):
+    """Open a template lazily, only its sentence count is read until pages are shown"""
+    if name is None:
+        return None
+    template = st.session_state.get('template')
+    if isinstance(template, LazyTemplate) and template.name == name:
+        return template
+    return LazyTemplate(name, page_size=SENTENCE_PAGE_SIZE)
+
+def get_page_window(template) -> tuple[int, int]:
+    """Sentences of the page picked in the right panel, as (start, stop)"""
+    page_size = getattr(template, 'page_size', SENTENCE_PAGE_SIZE)
+    page = st.session_state.get(f"page_{template.name}", 1) - 1
+    return page * page_size, (page + 1) * page_size
 
 def scene_preview():
-    """Render the scene preview"""
+    """Render the scene preview, only for the sentences of the page shown"""
+    # Keep the player's scene across reruns, only a different template starts a new one
     scene_template = st.session_state.template
-    scene = Scene(scene_template)
-    st.session_state.scene = scene
+    scene: Scene = st.session_state.selection_state.scene
+    if scene is None or getattr(scene.scene_template, 'name', None) != getattr(scene_template, 'name', None):
+        start_scene(scene_template)
+        scene = st.session_state.scene
  
     st.write("Scene Preview")
-    st.markdown(f"**{scene.get_filled_description()}**")
+    if scene_template is not None:
+        st.markdown(f"**{scene.get_filled_description(*get_page_window(scene_template))}**")
 
 def render_left_panel():
     """Render the left panel containing the scene template and preview"""
@@ -67,15 +108,13 @@ def render_left_panel():
 
 def entity_selector(tag: SceneTemplateTag):
     """Render a single entity selector for a given tag"""
-    # Get available entities
-    all_entities = get_entity_options(tag.entity_type)
     selection_state: SelectionState = st.session_state.selection_state
     
-    # Filter out used entities
+    # Rank available entities, other tags' entities are excluded but this tag's is kept
     used_entities = selection_state.used_entities.get(tag.entity_type.value, set())
-    available_entities = [e for e in all_entities if e.name not in used_entities or 
-                       tag.tag_name in selection_state.selections and 
-                       selection_state.selections[tag.tag_name][1].name == e.name]
+    if tag.tag_name in selection_state.selections:
+        used_entities = used_entities - {selection_state.selections[tag.tag_name][1].name}
+    available_entities = get_autofill().rank(tag, exclude=used_entities)
     
     # Create options dictionary
     entity_options = {str(entity): entity for entity in available_entities}
@@ -102,7 +141,16 @@ def sentence_selector(sentence_num: int, tags: list[SceneTemplateTag]):
     for tag in tags:
         entity_selector(tag)
 
-def render_right_panel(template: SceneTemplate, scene: Scene):
+def auto_fill(template: LazyTemplate):
+    """Fill every empty tag with the best ranked distinct entity, tags come from the stored tag keys"""
+    selection_state: SelectionState = st.session_state.selection_state
+    selections = {str(tag): entity.name for tag, entity in selection_state.selections.values()}
+    tags = {str(tag): tag for tag in template.get_template_tags()}
+    for key, entity in get_autofill().suggest(template, selections).items():
+        if key not in selections:
+            on_entity_change(tags[key], entity)
+
+def render_right_panel(template: LazyTemplate, scene: Scene):
     """Render the right panel containing entity selectors"""
     if not template:
         return None
@@ -113,15 +161,30 @@ def render_right_panel(template: SceneTemplate, scene: Scene):
     if 'selection_state' not in st.session_state:
         st.session_state.selection_state = SelectionState({}, {}, scene)
     
-    # Group tags by sentence
-    tags_by_sentence = template.get_tags_by_sentence()
+    # Group tags by sentence, only for the page of sentences shown
+    if template.page_count > 1:
+        st.number_input(
+            "Sentence page", min_value=1, max_value=template.page_count, key=f"page_{template.name}"
+        )
+    tags_by_sentence = template.get_tags_by_sentence(*get_page_window(template))
     
     # Process each sentence
     for sentence_num, tags in sorted(tags_by_sentence.items()):
         sentence_selector(sentence_num, tags)
 
+    if st.button("Auto-fill"):
+        auto_fill(template)
+        st.rerun()
+
+    selection_state: SelectionState = st.session_state.selection_state
+    undo_col, redo_col = st.columns(2)
+    with undo_col:
+        st.button("Undo", on_click=on_undo, disabled=not selection_state.can_undo)
+    with redo_col:
+        st.button("Redo", on_click=on_redo, disabled=not selection_state.can_redo)
+
     if st.button("Reset Selections"):
-        st.session_state.selection_state.clear()
+        selection_state.clear()
         st.rerun()
 
 def main():
@@ -0,0 +1,117 @@
+"""Concurrent player load test.
+
+Each simulated player runs on its own thread and repeats the game's
+selection flow against the database: pick a template, load options for
+each tag, select distinct entities, render the preview and undo a few
+selections. Every operation is timed and summarized as throughput and
+latency percentiles.
+"""
+import math
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from project_muse.scene import Scene
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate
+from .types import SelectionState
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(ordered: list[float], p: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def summarize(samples: dict[str, list[float]], elapsed: float) -> dict:
+    """Summarize per operation latencies, in milliseconds, and throughput per second"""
+    summary = {}
+    for operation, latencies in sorted(samples.items()):
+        ordered = sorted(latencies)
+        summary[operation] = {
+            'count': len(ordered),
+            'throughput': len(ordered) / elapsed if elapsed else 0.0,
+            'mean_ms': 1000 * sum(ordered) / len(ordered),
+            **{f"p{p}_ms": 1000 * percentile(ordered, p) for p in PERCENTILES},
+            'max_ms': 1000 * ordered[-1],
+        }
+    return summary
+
+class SimulatedPlayer:
+    """A single player running the selection flow and timing every step"""
+
+    def __init__(self, template_names: list[str], rounds: int, seed: Optional[int] = None):
+        self.template_names = template_names
+        self.rounds = rounds
+        self.rng = random.Random(seed)
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    @contextmanager
+    def timed(self, operation: str):
+        start = time.perf_counter()
+        yield
+        self.samples[operation].append(time.perf_counter() - start)
+
+    def run(self) -> dict[str, list[float]]:
+        for _ in range(self.rounds):
+            self.play_round()
+        return self.samples
+
+    def play_round(self):
+        with self.timed('choose_template'):
+            template = SceneTemplate.objects(name=self.rng.choice(self.template_names)).first()
+        scene = Scene(template)
+        selection_state = SelectionState({}, {}, scene)
+
+        for tag in {str(tag): tag for tag in template.get_template_tags()}.values():
+            with self.timed('get_entity_options'):
+                options = list(EntityTemplate.objects(entity_type=tag.entity_type))
+            used = selection_state.used_entities.get(tag.entity_type.value, set())
+            available = [entity for entity in options if entity.name not in used]
+            if not available:
+                continue
+            entity = self.rng.choice(available)
+
+            with self.timed('add_selection'):
+                selection_state.add_selection(tag, entity)
+            with self.timed('create_entity_by_tag'):
+                scene.create_entity_by_tag(tag, entity)
+            with self.timed('get_filled_description'):
+                scene.get_filled_description()
+
+        for tag_name in list(selection_state.selections):
+            if self.rng.random() < 0.25:
+                with self.timed('remove_selection'):
+                    selection_state.remove_selection(tag_name)
+
+def run_load_test(players: int = 10, rounds: int = 20, seed: Optional[int] = None) -> dict:
+    """Run `players` concurrent simulated players for `rounds` scenes each and report the results"""
+    template_names = [template.name for template in SceneTemplate.objects.only('name')]
+    if not template_names:
+        raise ValueError("No scene templates to play, add some first")
+
+    simulated = [
+        SimulatedPlayer(template_names, rounds, None if seed is None else seed + i)
+        for i in range(players)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=players) as executor:
+        results = list(executor.map(SimulatedPlayer.run, simulated))
+    elapsed = time.perf_counter() - start
+
+    samples = defaultdict(list)
+    for player_samples in results:
+        for operation, latencies in player_samples.items():
+            samples[operation].extend(latencies)
+    return {
+        'players': players,
+        'rounds': rounds,
+        'elapsed_s': elapsed,
+        'scenes_per_second': players * rounds / elapsed if elapsed else 0.0,
+        'operations': summarize(samples, elapsed),
+    }
@@ -1,2 +1,2 @@
-from ..types import SelectionState
-from .callbacks import on_entity_change, on_template_change
+from app.types import SelectionState
+from .callbacks import on_entity_change, on_template_change, get_scene_store
@@ -1,39 +1,50 @@
 import streamlit as st
-from ..types import SelectionState
-from ...project_muse.scene import Scene
-from ...project_muse.template.scene import SceneTemplate, SceneTemplateTag
-from ...project_muse.template.entity import BaseEntityTemplate
+from app.types import SelectionState, get_sentence_orders
+from project_muse.scene import Scene
+from project_muse.scene.persistence import SceneStore
+from project_muse.template.entity import EntityTemplate as BaseEntityTemplate
+from project_muse.template.scene import SceneTemplate, SceneTemplateTag
+
+@st.cache_resource
+def get_scene_store() -> SceneStore:
+    """Process wide write-behind store shared by every session"""
+    return SceneStore().start()
+
+def save_scene():
+    """Queue the selections' scene for persistence without waiting on the database"""
+    scene = st.session_state.selection_state.scene
+    if scene is not None:
+        get_scene_store().put(st.session_state.player_id, scene)
+
+def start_scene(template: SceneTemplate):
+    """Start an empty scene for a template, with fresh selections"""
+    st.session_state.scene = Scene(template)
+    st.session_state.selection_state = SelectionState({}, {}, st.session_state.scene)
+    save_scene()
 
 def on_entity_change(tag: SceneTemplateTag, new_entity: BaseEntityTemplate):
     """Handle entity selection changes"""
     selection_state: SelectionState = st.session_state.selection_state
-    scene: Scene = st.session_state.scene
-    
-    # Remove any downstream selections that used the previously selected entity
-    if tag.tag_name in selection_state.selections:
-        old_tag, old_entity = selection_state.selections[tag.tag_name]
-        
-        # Find all downstream tags (higher sentence numbers)
-        downstream_tags = []
-        for other_tag_name, (other_tag, other_entity) in selection_state.selections.items():
-            if (other_tag.sentence_num > tag.sentence_num and 
-                other_entity.name == old_entity.name):
-                downstream_tags.append(other_tag_name)
-        
-        # Remove downstream selections
-        for tag_name in downstream_tags:
-            selection_state.remove_selection(tag_name)
-    
-    # Add new selection
-    selection_state.add_selection(tag, new_entity)
+    scene: Scene = selection_state.scene
     
-    # Update scene
-    scene.create_entity_by_tag(tag, new_entity)
+    # One undo step restores the previous entity and every downstream selection
+    selection_state.replace_selection(tag, new_entity, get_sentence_orders(scene.scene_template))
+
+    # Update scene, downstream selections dropped above leave it too
+    selection_state.sync_scene()
+    save_scene()
+
+def on_undo():
+    """Undo the last selection change"""
+    st.session_state.selection_state.undo()
+    save_scene()
+
+def on_redo():
+    """Redo the last undone selection change"""
+    st.session_state.selection_state.redo()
+    save_scene()
 
 def on_template_change():
     """Handle template selection changes"""
-    template: SceneTemplate = st.session_state.template
-    
-    # Create new scene and selection state
-    st.session_state.scene = Scene(template)
-    st.session_state.selection_state = SelectionState({}, {}, st.session_state.scene) 
\ No newline at end of file
+    # The selector runs before the new template is opened, the scene is started once it is
+    st.session_state.template = None 
\ No newline at end of file
@@ -1,34 +1,158 @@
-from dataclasses import dataclass
-from typing import Dict, Set, Optional, Tuple
-from ..entity.template import BaseEntityTemplate
-from ..template.scene import SceneTemplateTag
-from ..scene import Scene
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Mapping, Optional, Tuple
+from project_muse.template.entity import EntityTemplate as BaseEntityTemplate
+from project_muse.template.scene import SceneTemplateTag
+from project_muse.scene import Scene, SceneEntity
+from project_muse.scene.history import History
+from project_muse.scene.persistent import PersistentMap, PersistentSet
+
+# Snapshots kept for undo, per player
+HISTORY_LIMIT = 500
+
+def get_sentence_orders(scene_template) -> dict[str, int]:
+    """Order of the first sentence each tag appears in, by tag name
+
+    A `LazyTemplate` reads them from its stored tag index, no sentence is loaded.
+    """
+    if scene_template is None:
+        return {}
+    orders = {}
+    for key, order in scene_template.get_tag_orders().items():
+        tag_name = key.split(':', 1)[1]
+        orders[tag_name] = min(order, orders.get(tag_name, order))
+    return orders
 
 @dataclass
 class SelectionState:
-    """Represents the current state of entity selections"""
-    selections: Dict[str, Tuple[SceneTemplateTag, BaseEntityTemplate]]  # tag_name -> (tag, entity)
-    used_entities: Dict[str, Set[str]]  # entity_type -> set of entity names
+    """Represents the current state of entity selections
+
+    All mappings are persistent, every change swaps in a new version that
+    shares its structure with the previous one, so each change is recorded
+    for undo and redo at constant cost.
+    """
+    selections: Mapping[str, Tuple[SceneTemplateTag, BaseEntityTemplate]]  # tag_name -> (tag, entity)
+    used_entities: Mapping[str, PersistentSet]  # entity_type -> set of entity names
     scene: Optional[Scene] = None
+    states: Mapping[str, str] = field(default_factory=dict)  # tag_name -> state of its entity
+    history: History = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.selections = PersistentMap.from_items(self.selections.items())
+        self.used_entities = PersistentMap.from_items(
+            (entity_type, PersistentSet(names)) for entity_type, names in self.used_entities.items()
+        )
+        self.states = PersistentMap.from_items(self.states.items())
+        self.history = History(self.snapshot(), limit=HISTORY_LIMIT)
+        self._batch_depth = 0
+
+    @classmethod
+    def from_scene(cls, scene: Scene) -> 'SelectionState':
+        """Selections of a restored scene, with an empty history"""
+        selection_state = cls({}, {}, scene)
+        for scene_entity in scene.entities:
+            selection_state._add(scene_entity.template_tag, scene_entity.entity, scene_entity.state)
+        selection_state.history.reset(selection_state.snapshot())
+        return selection_state
+
+    @property
+    def can_undo(self) -> bool:
+        return self.history.can_undo
+
+    @property
+    def can_redo(self) -> bool:
+        return self.history.can_redo
+
+    def snapshot(self) -> tuple:
+        """The current selections, safe to keep since they are never mutated"""
+        return self.selections, self.used_entities, self.states
+
+    def restore(self, snapshot: tuple):
+        """Make a snapshot current and rebuild the scene entities from it"""
+        self.selections, self.used_entities, self.states = snapshot
+        self.sync_scene()
+
+    def sync_scene(self):
+        """Rebuild the scene entities, with their states, from the current selections"""
+        if self.scene is not None:
+            self.scene.entities = [
+                SceneEntity(entity, tag, self.states.get(tag_name))
+                for tag_name, (tag, entity) in self.selections.items()
+            ]
+
+    @contextmanager
+    def batch(self):
+        """Record every change made inside the block as a single undo step"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            self._record()
+
+    def undo(self):
+        """Go back to the selections before the last change"""
+        self.restore(self.history.undo())
+
+    def redo(self):
+        """Reapply the last undone change"""
+        self.restore(self.history.redo())
 
     def clear(self):
-        """Clear all selections"""
-        self.selections = {}
-        self.used_entities = {}
-        
+        """Clear all selections, can be undone"""
+        self.restore((PersistentMap(), PersistentMap(), PersistentMap()))
+        self._record()
+
     def remove_selection(self, tag_name: str):
         """Remove a specific selection and update used_entities"""
         if tag_name in self.selections:
             tag, entity = self.selections[tag_name]
             entity_type = entity.entity_type.value
             if entity_type in self.used_entities:
-                self.used_entities[entity_type].remove(entity.name)
-            del self.selections[tag_name]
+                self.used_entities = self.used_entities.set(
+                    entity_type, self.used_entities[entity_type].discard(entity.name)
+                )
+            self.selections = self.selections.delete(tag_name)
+            self.states = self.states.delete(tag_name)
+            self._record()
 
-    def add_selection(self, tag: SceneTemplateTag, entity: BaseEntityTemplate):
+    def add_selection(self, tag: SceneTemplateTag, entity: BaseEntityTemplate, state: Optional[str] = None):
         """Add a new selection and update used_entities"""
+        self._add(tag, entity, state)
+        self._record()
+
+    def replace_selection(self, tag: SceneTemplateTag, entity: BaseEntityTemplate, sentence_orders: Mapping[str, int]):
+        """Select an entity for a tag, dropping downstream selections of the entity it replaces
+
+        Downstream tags are those first appearing in a later sentence, see
+        `get_sentence_orders`. The whole replacement is a single undo step.
+        """
+        with self.batch():
+            if tag.tag_name in self.selections:
+                _, old_entity = self.selections[tag.tag_name]
+                order = sentence_orders.get(tag.tag_name, 0)
+                downstream = [
+                    tag_name for tag_name, (_, other_entity) in self.selections.items()
+                    if sentence_orders.get(tag_name, -1) > order and other_entity.name == old_entity.name
+                ]
+                for tag_name in downstream:
+                    self.remove_selection(tag_name)
+            self.remove_selection(tag.tag_name)
+            self.add_selection(tag, entity)
+
+    def _add(self, tag: SceneTemplateTag, entity: BaseEntityTemplate, state: Optional[str] = None):
         entity_type = entity.entity_type.value
-        if entity_type not in self.used_entities:
-            self.used_entities[entity_type] = set()
-        self.used_entities[entity_type].add(entity.name)
-        self.selections[tag.tag_name] = (tag, entity) 
\ No newline at end of file
+        names = self.used_entities.get(entity_type, PersistentSet())
+        self.used_entities = self.used_entities.set(entity_type, names.add(entity.name))
+        self.selections = self.selections.set(tag.tag_name, (tag, entity))
+        if state is None:
+            self.states = self.states.delete(tag.tag_name)
+        else:
+            self.states = self.states.set(tag.tag_name, state)
+
+    def _record(self):
+        if self._batch_depth:
+            return
+        current = self.history.current
+        if any(previous is not now for previous, now in zip(current, self.snapshot())):
+            self.history.push(self.snapshot())
@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from bson import json_util
+from mongoengine import Document
+
+from .template.entity import EntityTemplate
+from .template.records import Record, from_son
+from .template.states import decode_state_names
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(os.environ.get(
+    'PROJECT_MUSE_CACHE', Path.home() / '.cache' / 'project_muse' / 'cache.sqlite3'
+))
+
+class DiskCache:
+    """
+    SQLite backed key value store with size bounded LRU eviction.
+
+    Entries are keyed by (collection, key) and carry the version of the
+    content they hold. Once the stored values exceed `max_bytes` the least
+    recently read entries are evicted.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                collection TEXT NOT NULL,
+                key TEXT NOT NULL,
+                version TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (collection, key)
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._connection.commit()
+
+    def get(self, collection: str, key: str) -> Optional[tuple[bytes, str, float]]:
+        """Get (value, version, stored_at) and mark the entry as recently used."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, version, stored_at FROM entries WHERE collection = ? AND key = ?",
+                (collection, key),
+            ).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE collection = ? AND key = ?",
+                    (time.time(), collection, key),
+                )
+                self._connection.commit()
+        return row
+
+    def get_version(self, collection: str, key: str) -> Optional[tuple[str, float]]:
+        """Get (version, stored_at) without reading the value."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT version, stored_at FROM entries WHERE collection = ? AND key = ?",
+                (collection, key),
+            ).fetchone()
+
+    def put(self, collection: str, key: str, value: bytes, version: str):
+        """Store a value, then evict least recently used entries beyond `max_bytes`."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection, key, version, value, len(value), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def touch(self, collection: str, key: str):
+        """Mark an entry as just revalidated without rewriting its value."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE entries SET stored_at = ? WHERE collection = ? AND key = ?",
+                (time.time(), collection, key),
+            )
+            self._connection.commit()
+
+    def delete(self, collection: str, key: Optional[str] = None):
+        """Delete one entry, or every entry of a collection."""
+        with self._lock:
+            if key is None:
+                self._connection.execute("DELETE FROM entries WHERE collection = ?", (collection,))
+            else:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE collection = ? AND key = ?", (collection, key)
+                )
+            self._connection.commit()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _evict(self):
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute(
+            "SELECT collection, key, size FROM entries ORDER BY accessed_at ASC"
+        ).fetchall()
+        for collection, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._connection.execute(
+                "DELETE FROM entries WHERE collection = ? AND key = ?", (collection, key)
+            )
+            total -= size
+
+# Applied to raw documents before they're cached, so a cold process can read them without Mongo
+CACHE_TRANSFORMS: dict[type, Callable[[dict], dict]] = {
+    EntityTemplate: decode_state_names,
+}
+
+def get_version(value: bytes) -> str:
+    """Content version of a cached value."""
+    return hashlib.blake2b(value, digest_size=16).hexdigest()
+
+class ReadThroughCache:
+    """
+    Read-through cache of raw Mongo documents on top of a `DiskCache`.
+
+    A cold process is served straight from disk. An entry not yet loaded by
+    this cache, whatever its age, or older than `ttl` seconds is still
+    served, but triggers a background reload from Mongo which only rewrites
+    the entry if its version changed. So a restarted process catches up on
+    changes made while it was down within one read of each entry.
+    """
+
+    def __init__(self, disk: DiskCache, ttl: float = 300.0):
+        self.disk = disk
+        self.ttl = ttl
+        self._revalidating: set[tuple[str, str]] = set()
+        # Entries loaded from Mongo at least once by this cache
+        self._loaded: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    # Public Methods
+    def get(self, collection: str, key: str, loader: Callable[[], list[dict]]) -> list[dict]:
+        """Get cached documents, calling `loader` on a miss or revalidating when stale."""
+        hit = self.disk.get(collection, key)
+        if hit is None:
+            return self._load(collection, key, loader)
+
+        value, _, stored_at = hit
+        if self._is_stale(collection, key, stored_at):
+            self._revalidate_in_background(collection, key, loader)
+        return json_util.loads(value)
+
+    def get_documents(self, document: type[Document], **query) -> list[Document]:
+        """Get every document of a class matching `query`, hydrated from the cache."""
+        return [document._from_son(son) for son in self._get_raw(document, query)]
+
+    def get_records(self, document: type[Document], **query) -> list[Record]:
+        """Like `get_documents`, but decoded into read-only records without hydration."""
+        return [from_son(document, son) for son in self._get_raw(document, query)]
+
+    def get_entry_version(self, document: type[Document], **query) -> str:
+        """Version of the cached documents matching `query`, without decoding them.
+
+        Loads or revalidates the entry like `get_records` does, so it's cheap
+        enough to check on every read and key derived state on.
+        """
+        collection, key, loader = self._get_entry(document, query)
+        hit = self.disk.get_version(collection, key)
+        if hit is None:
+            return self._store(collection, key, loader())
+
+        version, stored_at = hit
+        if self._is_stale(collection, key, stored_at):
+            self._revalidate_in_background(collection, key, loader)
+        return version
+
+    def invalidate(self, collection: str):
+        """Drop every cached entry of a collection."""
+        self.disk.delete(collection)
+
+    def wait(self):
+        """Wait for running background revalidations, mostly useful in tests."""
+        for thread in threading.enumerate():
+            if thread.name.startswith('cache-revalidate'):
+                thread.join()
+
+    # Internal Methods
+    def _get_raw(self, document: type[Document], query: dict) -> list[dict]:
+        return self.get(*self._get_entry(document, query))
+
+    def _get_entry(self, document: type[Document], query: dict) -> tuple[str, str, Callable[[], list[dict]]]:
+        collection = document._get_collection_name()
+        key = repr(sorted((field, str(value)) for field, value in query.items()))
+
+        def loader():
+            documents = list(document.objects(**query).as_pymongo())
+            transform = CACHE_TRANSFORMS.get(document)
+            return [transform(son) for son in documents] if transform else documents
+
+        return collection, key, loader
+
+    def _load(self, collection: str, key: str, loader: Callable[[], list[dict]]) -> list[dict]:
+        documents = loader()
+        self._store(collection, key, documents)
+        return documents
+
+    def _is_stale(self, collection: str, key: str, stored_at: float) -> bool:
+        return (collection, key) not in self._loaded or time.time() - stored_at >= self.ttl
+
+    def _store(self, collection: str, key: str, documents: list[dict]) -> str:
+        value = json_util.dumps(documents).encode()
+        version = get_version(value)
+        hit = self.disk.get_version(collection, key)
+        if hit is not None and hit[0] == version:
+            self.disk.touch(collection, key)
+        else:
+            self.disk.put(collection, key, value, version)
+        with self._lock:
+            self._loaded.add((collection, key))
+        return version
+
+    def _revalidate_in_background(self, collection: str, key: str, loader: Callable[[], list[dict]]):
+        with self._lock:
+            if (collection, key) in self._revalidating:
+                return
+            self._revalidating.add((collection, key))
+
+        def revalidate():
+            try:
+                self._store(collection, key, loader())
+            except Exception:
+                # The cached entry keeps being served, the next read tries again
+                logger.exception("Revalidating cached %s entry %s failed", collection, key)
+            finally:
+                with self._lock:
+                    self._revalidating.discard((collection, key))
+
+        threading.Thread(target=revalidate, name=f"cache-revalidate-{collection}", daemon=True).start()
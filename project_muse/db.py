@@ -1,4 +1,9 @@
 from mongoengine import connect
 
-def init_db():
-    connect('story_puzzles_db', host='mongodb://localhost:27017/story_puzzles_db', alias='default') 
\ No newline at end of file
+def init_db(**kwargs):
+    """Connect to the game database.
+
+    Extra keyword arguments go to `mongoengine.connect`, e.g. `mongo_client_class`
+    to run against a local stand-in instead of a Mongo server.
+    """
+    connect('story_puzzles_db', host='mongodb://localhost:27017/story_puzzles_db', alias='default', **kwargs)
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from typing import Callable
+
+from mongoengine import Document
+
+from .types import EntityType
+from .scene.persistence import SceneRecord
+from .template.capacity import UNINDEXED_QUERY
+from .template.entity import EntityTemplate
+from .template.migration import MigrationCheckpoint
+from .template.query import iter_entities, iter_templates
+from .template.scene import SceneTemplate
+from .template.states import EntityState
+
+DOCUMENTS: list[type[Document]] = [EntityTemplate, EntityState, SceneTemplate, SceneRecord, MigrationCheckpoint]
+
+@dataclass
+class QueryPlan:
+    """The winning plan of one audited query shape."""
+    source: str
+    query: str
+    stages: list[str]
+
+    @property
+    def collection_scan(self) -> bool:
+        return 'COLLSCAN' in self.stages
+
+    def __str__(self):
+        flag = "COLLSCAN" if self.collection_scan else "ok"
+        return f"[{flag}] {self.source}: {self.query} -> {' > '.join(self.stages)}"
+
+# The filtered query shapes issued by the game, editor, api and tasks, as
+# (source, description, factory of a cursor or queryset). Full listings are
+# left out, a scan is the right plan for them.
+QUERY_SHAPES: list[tuple[str, str, Callable]] = [
+    ("game", "scene template by name",
+     lambda: SceneTemplate.objects(name="?")),
+    ("game", "sentence window of a template",
+     lambda: SceneTemplate._get_collection().find({'name': "?"}, {'sentences': {'$slice': [0, 10]}})),
+    ("game", "entity options by type",
+     lambda: EntityTemplate.objects(entity_type=EntityType.CHARACTER).order_by('name')),
+    ("game", "entities of a type supporting a state",
+     lambda: EntityTemplate.objects.supporting_state(EntityType.CHARACTER, "?")),
+    ("game", "templates using a tag",
+     lambda: SceneTemplate.objects.using_tag(EntityType.CHARACTER, "?")),
+    ("game", "templates by slot counts",
+     lambda: SceneTemplate.objects.requiring_at_most({EntityType.CHARACTER: 2})),
+    ("editor", "entity grid by type",
+     lambda: EntityTemplate._get_collection().find({'entity_type': 'character'}).sort('name', 1)),
+    ("tasks", "list-entities by type",
+     lambda: iter_entities(entity_type=EntityType.CHARACTER)),
+    ("tasks", "list-entities sorted by type",
+     lambda: iter_entities(sort='type')),
+    ("tasks", "list-entities by name prefix",
+     lambda: iter_entities(name_prefix="?")),
+    ("tasks", "list-entities by state",
+     lambda: iter_entities(state="?")),
+    ("tasks", "list-templates by entity type",
+     lambda: iter_templates(entity_type=EntityType.CREATURE)),
+    ("tasks", "capacity-report unindexed templates",
+     lambda: SceneTemplate._get_collection().find(UNINDEXED_QUERY, {'_id': 0, 'name': 1})),
+    ("tasks", "bulk upload name lookup",
+     lambda: EntityTemplate._get_collection().find({'name': {'$in': ["?"]}})),
+]
+
+def ensure_indexes() -> dict[str, list[str]]:
+    """Create every declared index, returns the index names per collection."""
+    indexes = {}
+    for document in DOCUMENTS:
+        document.ensure_indexes()
+        collection = document._get_collection()
+        indexes[collection.name] = sorted(collection.index_information())
+    return indexes
+
+def get_plan_stages(plan) -> list[str]:
+    """Flatten the stage names of an explain plan, outermost first."""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(get_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(get_plan_stages(value))
+    return stages
+
+def audit_query_plans() -> list[QueryPlan]:
+    """Explain every known query shape and report the stages of its winning plan."""
+    plans = []
+    for source, query, make_cursor in QUERY_SHAPES:
+        explain = make_cursor().explain()
+        winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+        plans.append(QueryPlan(source, query, get_plan_stages(winning_plan)))
+    return plans
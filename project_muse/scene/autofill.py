@@ -0,0 +1,155 @@
+import re
+from collections import Counter, defaultdict
+from typing import Iterable, Iterator, Optional
+
+from ..types import EntityType
+from ..template.entity import EntityTemplate
+from ..template.scene import SceneTemplate, SceneTemplateTag
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Relative weight of each kind of match when ranking candidates
+EXACT_NAME_WEIGHT = 10.0
+NAME_TOKEN_WEIGHT = 3.0
+NAME_TRIGRAM_WEIGHT = 2.0
+DESCRIPTION_TOKEN_WEIGHT = 1.0
+STATE_WEIGHT = 1.5
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {(text or '').lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class AutoFill:
+    """
+    Ranks entities for scene template tags from indexes built once per catalog.
+
+    Every index is an inverted index from (entity type, key) to entity
+    positions, so ranking a tag only touches the entities sharing a token,
+    trigram or state with it instead of the whole catalog.
+    """
+
+    def __init__(self, entities: Iterable[EntityTemplate]):
+        self.entities = list(entities)
+        self._by_name = {entity.name: entity for entity in self.entities}
+        self._by_type: dict[EntityType, list[int]] = defaultdict(list)
+        self._names: dict[tuple[EntityType, str], list[int]] = defaultdict(list)
+        self._name_tokens: dict[tuple[EntityType, str], list[int]] = defaultdict(list)
+        self._name_trigrams: dict[tuple[EntityType, str], list[int]] = defaultdict(list)
+        self._description_tokens: dict[tuple[EntityType, str], list[int]] = defaultdict(list)
+        self._states: dict[tuple[EntityType, str], set[int]] = defaultdict(set)
+        self._trigram_counts: list[int] = []
+
+        for position, entity in enumerate(self.entities):
+            entity_type = entity.entity_type
+            self._by_type[entity_type].append(position)
+            self._names[(entity_type, entity.name.lower())].append(position)
+            for token in set(tokenize(entity.name)):
+                self._name_tokens[(entity_type, token)].append(position)
+            name_trigrams = trigrams(entity.name)
+            self._trigram_counts.append(len(name_trigrams))
+            for trigram in name_trigrams:
+                self._name_trigrams[(entity_type, trigram)].append(position)
+            for token in set(tokenize(entity.description)):
+                self._description_tokens[(entity_type, token)].append(position)
+            for state in entity.possible_states:
+                self._states[(entity_type, state.lower())].add(position)
+
+    # Public Methods
+    def score(self, tag: SceneTemplateTag, state: Optional[str] = None) -> Counter:
+        """Score every entity with anything in common with the tag, by position."""
+        entity_type = tag.entity_type
+        scores = Counter()
+        for position in self._names.get((entity_type, tag.tag_name.lower()), ()):
+            scores[position] += EXACT_NAME_WEIGHT
+        for token in set(tokenize(tag.tag_name)):
+            for position in self._name_tokens.get((entity_type, token), ()):
+                scores[position] += NAME_TOKEN_WEIGHT
+            for position in self._description_tokens.get((entity_type, token), ()):
+                scores[position] += DESCRIPTION_TOKEN_WEIGHT
+
+        tag_trigrams = trigrams(tag.tag_name)
+        shared = Counter()
+        for trigram in tag_trigrams:
+            shared.update(self._name_trigrams.get((entity_type, trigram), ()))
+        for position, count in shared.items():
+            # Dice coefficient of the two trigram sets
+            scores[position] += NAME_TRIGRAM_WEIGHT * 2 * count / (len(tag_trigrams) + self._trigram_counts[position])
+
+        if state is not None:
+            for position in self._states.get((entity_type, state.lower()), ()):
+                scores[position] += STATE_WEIGHT
+        return scores
+
+    def rank(
+        self,
+        tag: SceneTemplateTag,
+        exclude: Iterable[str] = (),
+        state: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[EntityTemplate]:
+        """Entities that can fill the tag, best match first.
+
+        Entities named in `exclude` are skipped, matches are followed by the
+        rest of the entities of the tag's type in catalog order.
+        """
+        return [self.entities[position] for position in self._iter_ranked(tag, set(exclude), state, limit)]
+
+    def suggest(
+        self,
+        scene_template: SceneTemplate,
+        selections: Optional[dict[str, str]] = None,
+        states: Optional[dict[str, str]] = None,
+    ) -> dict[str, EntityTemplate]:
+        """Propose a distinct entity for every tag of a template, keyed by tag string.
+
+        `selections` maps tags already filled by the player to entity names, those
+        are kept. Tags with no entity left to fill them are missing from the result.
+        """
+        selections = selections or {}
+        states = states or {}
+        used: dict[EntityType, set[str]] = defaultdict(set)
+        tags = list({str(tag): tag for tag in scene_template.get_template_tags()}.values())
+
+        for tag in tags:
+            if str(tag) in selections:
+                used[tag.entity_type].add(selections[str(tag)])
+
+        assignment = {}
+        for tag in tags:
+            key = str(tag)
+            if key in selections:
+                if selections[key] in self._by_name:
+                    assignment[key] = self._by_name[selections[key]]
+                continue
+            for position in self._iter_ranked(tag, used[tag.entity_type], states.get(key), 1):
+                entity = self.entities[position]
+                assignment[key] = entity
+                used[tag.entity_type].add(entity.name)
+        return assignment
+
+    # Internal Methods
+    def _iter_ranked(
+        self,
+        tag: SceneTemplateTag,
+        exclude: set[str],
+        state: Optional[str],
+        limit: Optional[int],
+    ) -> Iterator[int]:
+        scores = self.score(tag, state)
+        ranked = sorted(scores, key=lambda position: (-scores[position], position))
+        count = 0
+        for position in ranked:
+            if limit is not None and count >= limit:
+                return
+            if self.entities[position].name not in exclude:
+                count += 1
+                yield position
+        for position in self._by_type.get(tag.entity_type, ()):
+            if limit is not None and count >= limit:
+                return
+            if position not in scores and self.entities[position].name not in exclude:
+                count += 1
+                yield position
@@ -0,0 +1,202 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from ..types import EntityType
+from ..template.entity import EntityTemplate
+from ..template.scene import SceneTemplate, SceneTemplateTag
+from . import Scene
+
+EMPTY = -1
+ENTITY_TYPES = list(EntityType)
+
+class EntityCatalog:
+    """
+    Integer ids for a fixed list of entities and the states they can be in.
+
+    Entity ids are positions in `entities`, state ids are positions in `states`.
+    `state_mask[entity_id, state_id]` is true if the state is one of the
+    entity's `possible_states`.
+    """
+
+    def __init__(self, entities: Iterable[EntityTemplate]):
+        self.entities = list(entities)
+        self.entity_ids = {entity.name: i for i, entity in enumerate(self.entities)}
+        self.entity_types = np.array(
+            [ENTITY_TYPES.index(entity.entity_type) for entity in self.entities], dtype=np.int8
+        )
+
+        self.states = list(dict.fromkeys(
+            state for entity in self.entities for state in entity.possible_states
+        ))
+        self.state_ids = {state: i for i, state in enumerate(self.states)}
+        self.state_mask = np.zeros((len(self.entities), len(self.states)), dtype=bool)
+        for entity_id, entity in enumerate(self.entities):
+            self.state_mask[entity_id, [self.state_ids[s] for s in entity.possible_states]] = True
+
+    def get_ids_by_type(self, entity_type: EntityType) -> np.ndarray:
+        """Get the ids of every entity of the given type."""
+        return np.flatnonzero(self.entity_types == ENTITY_TYPES.index(entity_type))
+
+    def __len__(self):
+        return len(self.entities)
+
+class SceneBatch:
+    """
+    A batch of scenes for one scene template, stored column-wise.
+
+    Each row is a scene and each column a distinct tag slot of the template,
+    holding an entity id from the catalog, or `EMPTY` if the slot is unfilled.
+    `state_ids` has the same shape and holds a state id, or `EMPTY`.
+    """
+
+    def __init__(
+        self,
+        scene_template: SceneTemplate,
+        catalog: EntityCatalog,
+        entity_ids: np.ndarray,
+        state_ids: Optional[np.ndarray] = None,
+    ):
+        self.scene_template = scene_template
+        self.catalog = catalog
+        self.slots = _get_slots(scene_template)
+        self.slot_types = np.array(
+            [ENTITY_TYPES.index(tag.entity_type) for tag in self.slots], dtype=np.int8
+        )
+
+        self.entity_ids = np.asarray(entity_ids, dtype=np.int32).reshape(-1, len(self.slots))
+        if state_ids is None:
+            state_ids = np.full(self.entity_ids.shape, EMPTY, dtype=np.int32)
+        self.state_ids = np.asarray(state_ids, dtype=np.int32)
+        if self.state_ids.shape != self.entity_ids.shape:
+            raise ValueError(f"State ids {self.state_ids.shape} do not match entity ids {self.entity_ids.shape}")
+
+    # Constructors
+    @classmethod
+    def empty(cls, scene_template: SceneTemplate, catalog: EntityCatalog, size: int) -> 'SceneBatch':
+        """Create a batch of unfilled scenes."""
+        entity_ids = np.full((size, len(_get_slots(scene_template))), EMPTY, dtype=np.int32)
+        return cls(scene_template, catalog, entity_ids)
+
+    @classmethod
+    def sample(
+        cls,
+        scene_template: SceneTemplate,
+        catalog: EntityCatalog,
+        size: int,
+        rng: Optional[np.random.Generator] = None,
+    ) -> 'SceneBatch':
+        """Draw random complete scenes, with distinct entities of the right type in every row.
+
+        Slots are left `EMPTY` for entity types the catalog does not have enough of.
+        """
+        rng = rng or np.random.default_rng()
+        batch = cls.empty(scene_template, catalog, size)
+        for type_code in np.unique(batch.slot_types):
+            columns = np.flatnonzero(batch.slot_types == type_code)
+            candidates = catalog.get_ids_by_type(ENTITY_TYPES[type_code])
+            if len(candidates) < len(columns):
+                continue
+            picks = _sample_distinct(rng, size, len(candidates), len(columns))
+            batch.entity_ids[:, columns] = candidates[picks]
+        return batch
+
+    @classmethod
+    def from_scenes(cls, scenes: list[Scene], catalog: EntityCatalog) -> 'SceneBatch':
+        """Encode scenes that share a scene template."""
+        scene_template = scenes[0].scene_template
+        batch = cls.empty(scene_template, catalog, len(scenes))
+        columns = {str(tag): column for column, tag in enumerate(batch.slots)}
+        for row, scene in enumerate(scenes):
+            if scene.scene_template is not scene_template:
+                raise ValueError("All scenes in a batch must share a scene template")
+            for scene_entity in scene.entities:
+                column = columns[str(scene_entity.template_tag)]
+                batch.entity_ids[row, column] = catalog.entity_ids[scene_entity.entity.name]
+                if scene_entity.state is not None:
+                    batch.state_ids[row, column] = catalog.state_ids[scene_entity.state]
+        return batch
+
+    # Conversion
+    def to_scenes(self) -> list[Scene]:
+        """Decode every row back into a `Scene`."""
+        return [self.get_scene(row) for row in range(len(self))]
+
+    def get_scene(self, row: int) -> Scene:
+        """Decode a single row into a `Scene`."""
+        scene = Scene(self.scene_template)
+        for column, tag in enumerate(self.slots):
+            entity_id = self.entity_ids[row, column]
+            if entity_id == EMPTY:
+                continue
+            state_id = self.state_ids[row, column]
+            state = self.catalog.states[state_id] if state_id != EMPTY else None
+            scene.create_entity_by_tag(tag, self.catalog.entities[entity_id], state)
+        return scene
+
+    # Vectorized Checks
+    def filled(self) -> np.ndarray:
+        """Boolean (scenes, slots) mask of filled slots."""
+        return self.entity_ids != EMPTY
+
+    def is_complete(self) -> np.ndarray:
+        """Per scene, whether every slot is filled."""
+        return self.filled().all(axis=1)
+
+    def is_unique(self) -> np.ndarray:
+        """Per scene, whether no entity fills more than one slot."""
+        ordered = np.sort(self.entity_ids, axis=1)
+        repeated = (ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] != EMPTY)
+        return ~repeated.any(axis=1)
+
+    def is_type_valid(self) -> np.ndarray:
+        """Per scene, whether every filled slot holds an entity of the slot's type."""
+        if not self.filled().any():
+            return np.ones(len(self), dtype=bool)
+        types = self.catalog.entity_types[np.where(self.filled(), self.entity_ids, 0)]
+        return ((types == self.slot_types) | ~self.filled()).all(axis=1)
+
+    def is_state_valid(self) -> np.ndarray:
+        """Per scene, whether every chosen state is a possible state of its entity."""
+        has_state = self.filled() & (self.state_ids != EMPTY)
+        if not has_state.any():
+            return np.ones(len(self), dtype=bool)
+        possible = self.catalog.state_mask[
+            np.where(has_state, self.entity_ids, 0),
+            np.where(has_state, self.state_ids, 0),
+        ]
+        return (possible | ~has_state).all(axis=1)
+
+    def is_valid(self) -> np.ndarray:
+        """Per scene, whether it passes the uniqueness, type and state checks."""
+        return self.is_unique() & self.is_type_valid() & self.is_state_valid()
+
+    def compare(self, other: 'SceneBatch') -> np.ndarray:
+        """Boolean (scenes, slots) mask of slots filled the same way in both batches."""
+        return (self.entity_ids == other.entity_ids) & (self.state_ids == other.state_ids)
+
+    def equals(self, other: 'SceneBatch') -> np.ndarray:
+        """Per scene, whether both batches hold the same scene."""
+        return self.compare(other).all(axis=1)
+
+    def __len__(self):
+        return self.entity_ids.shape[0]
+
+def _get_slots(scene_template: SceneTemplate) -> list[SceneTemplateTag]:
+    """Distinct tags of a scene template, a tag repeated across sentences is one slot."""
+    return list({str(tag): tag for tag in scene_template.get_template_tags()}.values())
+
+def _sample_distinct(rng: np.random.Generator, size: int, n: int, k: int) -> np.ndarray:
+    """(size, k) positions below `n`, distinct within each row and in random order.
+
+    Floyd's algorithm run on every row at once: for each `j` from `n - k` to
+    `n - 1` a position up to `j` is drawn, and `j` taken instead if the row
+    already has it. Only (size, k) positions are ever held, however large `n`.
+    """
+    picks = np.empty((size, k), dtype=np.int64)
+    for column, j in enumerate(range(n - k, n)):
+        drawn = rng.integers(0, j + 1, size=size)
+        taken = (picks[:, :column] == drawn[:, None]).any(axis=1)
+        picks[:, column] = np.where(taken, j, drawn)
+    # Floyd's subsets are uniform but not their order, positions late in the range land in late columns
+    return rng.permuted(picks, axis=1)
@@ -0,0 +1,208 @@
+import json
+import os
+import random
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import IO, Iterable, Iterator, Optional
+
+from ..types import EntityType
+from ..template.entity import EntityTemplate
+from ..template.migration import split_sentences
+from ..template.query import iter_templates
+from ..template.scene import build_tag_index, parse_template_tags
+
+# Fields a worker needs to fill a template, legacy templates only have a template_description
+GENERATE_FIELDS = {
+    '_id': 0, 'name': 1, 'sentences.text': 1, 'sentences.order': 1, 'tag_keys': 1, 'template_description': 1,
+}
+
+# Entity lists of an `invoke export-db` backup, for documents without an entity_type
+BACKUP_ENTITY_TYPES = {
+    'characters': EntityType.CHARACTER,
+    'creatures': EntityType.CREATURE,
+    'objects': EntityType.OBJECT_PROP,
+    'structures': EntityType.STRUCTURE,
+    'landmarks': EntityType.LANDMARK,
+}
+
+# Entity names per entity type value, read only once handed to the workers
+Catalog = dict[str, tuple[str, ...]]
+
+_catalog: Catalog = {}
+
+@dataclass
+class GenerateStats:
+    templates: int = 0
+    scenes: int = 0
+    skipped: int = 0
+
+    def to_dict(self) -> dict:
+        return {'templates': self.templates, 'scenes': self.scenes, 'skipped': self.skipped}
+
+def is_ndjson(path: str) -> bool:
+    return path.endswith(('.ndjson', '.jsonl'))
+
+def read_backup(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def iter_template_documents(
+    path: Optional[str] = None,
+    entity_type: Optional[EntityType] = None,
+    batch_size: int = 100,
+) -> Iterator[dict]:
+    """Stream raw scene templates from the database, an NDJSON file or an `export-db` backup.
+
+    NDJSON is read a line at a time. A JSON backup is a single document and
+    has to be loaded whole.
+    """
+    if path is None:
+        yield from iter_templates(entity_type=entity_type, batch_size=batch_size, fields=GENERATE_FIELDS)
+        return
+
+    if is_ndjson(path):
+        with open(path) as f:
+            documents = (json.loads(line) for line in f if line.strip())
+            yield from _filter_by_type(documents, entity_type)
+    else:
+        yield from _filter_by_type(read_backup(path).get('scene_templates', []), entity_type)
+
+def _filter_by_type(documents: Iterable[dict], entity_type: Optional[EntityType]) -> Iterator[dict]:
+    for document in documents:
+        if entity_type is None or any(key.startswith(f"{entity_type.value}:") for key in get_tag_keys(document)):
+            yield document
+
+def load_catalog(path: Optional[str] = None) -> Catalog:
+    """Entity names by type from the database, an NDJSON file or an `export-db` backup."""
+    names: dict[str, list[str]] = defaultdict(list)
+    if path is None:
+        cursor = EntityTemplate._get_collection().find({}, {'_id': 0, 'name': 1, 'entity_type': 1})
+        for document in cursor.sort([('entity_type', 1), ('name', 1)]):
+            names[document['entity_type']].append(document['name'])
+    elif is_ndjson(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    document = json.loads(line)
+                    names[document['entity_type']].append(document['name'])
+    else:
+        for key, documents in read_backup(path).items():
+            if key == 'scene_templates' or not isinstance(documents, list):
+                continue
+            for document in documents:
+                entity_type = document.get('entity_type') or BACKUP_ENTITY_TYPES[key].value
+                names[entity_type].append(document['name'])
+    return {entity_type: tuple(entity_names) for entity_type, entity_names in names.items()}
+
+def get_sentence_texts(document: dict) -> list[str]:
+    """Sentences of a raw template in order, split from its description if not yet migrated."""
+    if document.get('sentences'):
+        return [sentence['text'] for sentence in sorted(document['sentences'], key=lambda s: s['order'])]
+    return split_sentences(document.get('template_description'))
+
+def get_tag_keys(document: dict) -> list[str]:
+    """The denormalized tag keys of a raw template, parsed from its sentences if missing."""
+    if document.get('tag_keys') is not None:
+        return document['tag_keys']
+    tags = []
+    for text in get_sentence_texts(document):
+        tags.extend(parse_template_tags(text))
+    return build_tag_index(tags)[0]
+
+def fill_template(document: dict, catalog: Catalog, scenes: int = 1, seed: Optional[int] = None) -> list[dict]:
+    """Fill every tag of a raw template with distinct entities, `scenes` times.
+
+    Returns no scenes if the template has no sentences or the catalog can't
+    fill it. With a seed, the entities picked only depend on the seed and
+    the template name, without one they differ on every run.
+    """
+    texts = get_sentence_texts(document)
+    if not texts:
+        return []
+    tag_keys = get_tag_keys(document)
+    keys_by_type = defaultdict(list)
+    for key in tag_keys:
+        keys_by_type[key.split(':', 1)[0]].append(key)
+    if any(len(catalog.get(entity_type, ())) < len(keys) for entity_type, keys in keys_by_type.items()):
+        return []
+
+    description = "\n".join(texts)
+    rng = random.Random(f"{seed}:{document['name']}") if seed is not None else random.Random()
+    results = []
+    for number in range(scenes):
+        entities = {}
+        for entity_type, keys in keys_by_type.items():
+            entities.update(zip(keys, rng.sample(catalog[entity_type], len(keys))))
+        filled = description
+        for key, name in entities.items():
+            filled = filled.replace(f"{{{key}}}", name)
+        results.append({
+            'template': document['name'],
+            'scene': number,
+            'entities': entities,
+            'description': filled,
+        })
+    return results
+
+def _init_worker(catalog: Catalog):
+    global _catalog
+    _catalog = catalog
+
+def _fill_chunk(documents: list[dict], scenes: int, seed: Optional[int]) -> tuple[list[str], int]:
+    """Fill a chunk of templates in a worker, returns (NDJSON lines, templates skipped)."""
+    lines, skipped = [], 0
+    for document in documents:
+        results = fill_template(document, _catalog, scenes, seed)
+        if not results:
+            skipped += 1
+        lines.extend(json.dumps(result) for result in results)
+    return lines, skipped
+
+def _chunks(documents: Iterable[dict], chunk_size: int) -> Iterator[list[dict]]:
+    iterator = iter(documents)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+def generate_scenes(
+    documents: Iterable[dict],
+    catalog: Catalog,
+    output: IO[str],
+    scenes: int = 1,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    max_pending: Optional[int] = None,
+) -> GenerateStats:
+    """Fill templates across a process pool and write the scenes to `output` as NDJSON.
+
+    Templates are sent to the workers in chunks, and at most `max_pending`
+    chunks (twice the workers by default) are in flight. Once that many are
+    waiting, the source isn't read further until the oldest chunk is written,
+    so memory stays bounded however many templates are streamed. Output
+    follows the order of the source.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    stats = GenerateStats()
+    pending: deque[tuple[Future, int]] = deque()
+
+    def write_oldest():
+        future, count = pending.popleft()
+        lines, skipped = future.result()
+        for line in lines:
+            output.write(line)
+            output.write("\n")
+        stats.templates += count
+        stats.scenes += len(lines)
+        stats.skipped += skipped
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog,)) as executor:
+        for chunk in _chunks(documents, chunk_size):
+            if len(pending) >= max_pending:
+                write_oldest()
+            pending.append((executor.submit(_fill_chunk, chunk, scenes, seed), len(chunk)))
+        while pending:
+            write_oldest()
+    return stats
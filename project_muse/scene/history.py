@@ -0,0 +1,55 @@
+from collections import deque
+from typing import Generic, Optional, TypeVar
+
+State = TypeVar('State')
+
+class History(Generic[State]):
+    """
+    Undo and redo stacks of immutable snapshots.
+
+    Snapshots are expected to be persistent values (see `persistent`), so
+    recording one only keeps a reference to it. With a `limit` the oldest
+    snapshots are dropped first, keeping long sessions bounded.
+    """
+
+    def __init__(self, initial: State, limit: Optional[int] = None):
+        self.current = initial
+        self._undo: deque[State] = deque(maxlen=limit)
+        self._redo: list[State] = []
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    # Public Methods
+    def push(self, state: State):
+        """Record a new current state, dropping anything that could be redone."""
+        if state is self.current:
+            return
+        self._undo.append(self.current)
+        self.current = state
+        self._redo.clear()
+
+    def undo(self) -> State:
+        if not self._undo:
+            raise IndexError("Nothing to undo")
+        self._redo.append(self.current)
+        self.current = self._undo.pop()
+        return self.current
+
+    def redo(self) -> State:
+        if not self._redo:
+            raise IndexError("Nothing to redo")
+        self._undo.append(self.current)
+        self.current = self._redo.pop()
+        return self.current
+
+    def reset(self, state: State):
+        """Make `state` current and forget every recorded snapshot."""
+        self.current = state
+        self._undo.clear()
+        self._redo.clear()
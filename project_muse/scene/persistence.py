@@ -0,0 +1,147 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from mongoengine import Document, StringField, ListField, DictField, DateTimeField
+from pymongo import ReplaceOne
+
+from ..template.entity import EntityTemplate
+from ..template.scene import SceneTemplate
+from . import Scene
+
+logger = logging.getLogger(__name__)
+
+class SceneRecord(Document):
+    """The last saved scene of a player, keyed by player id."""
+    meta = {'collection': 'scene_records'}
+    player_id = StringField(primary_key=True)
+    template_name = StringField()
+    entities = ListField(DictField())
+    saved_at = DateTimeField()
+
+def scene_to_record(player_id: str, scene: Scene) -> dict:
+    """Snapshot a scene into a plain record document.
+
+    Only names are stored, selections are rebuilt from them with `restore_scene`.
+    """
+    return {
+        '_id': player_id,
+        'template_name': scene.scene_template.name if scene.scene_template else None,
+        'entities': [
+            {
+                'tag': str(scene_entity.template_tag),
+                'entity': scene_entity.entity.name,
+                'state': scene_entity.state,
+            }
+            for scene_entity in scene.entities
+        ],
+        'saved_at': datetime.now(timezone.utc),
+    }
+
+def restore_scene(record: dict) -> Optional[Scene]:
+    """Rebuild a scene from a record document, skipping tags or entities that no longer exist."""
+    if not record or not record.get('template_name'):
+        return None
+    scene_template = SceneTemplate.objects(name=record['template_name']).first()
+    if scene_template is None:
+        return None
+
+    tags = {str(tag): tag for tag in scene_template.get_template_tags()}
+    names = [saved['entity'] for saved in record['entities']]
+    entities = {entity.name: entity for entity in EntityTemplate.objects(name__in=names)}
+
+    scene = Scene(scene_template)
+    for saved in record['entities']:
+        if saved['tag'] in tags and saved['entity'] in entities:
+            scene.create_entity_by_tag(tags[saved['tag']], entities[saved['entity']], saved.get('state'))
+    return scene
+
+class SceneStore:
+    """
+    Write-behind store for player scenes.
+
+    `put` only snapshots the scene into memory, a background thread flushes
+    pending snapshots every `flush_interval` seconds as one unordered
+    `bulk_write`. Repeated puts for a player between flushes coalesce into a
+    single write of the latest snapshot. `close` flushes whatever is pending
+    and is registered with `atexit` so a clean shutdown loses nothing.
+    """
+
+    def __init__(self, flush_interval: float = 1.0):
+        self.flush_interval = flush_interval
+        self._pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Public Methods
+    def start(self) -> 'SceneStore':
+        """Start the background flush thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="scene-store-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def close(self):
+        """Stop the flush thread and write everything still pending."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.close)
+        self.flush()
+
+    def put(self, player_id: str, scene: Scene):
+        """Queue the current state of a player's scene for the next flush."""
+        record = scene_to_record(player_id, scene)
+        with self._lock:
+            self._pending[player_id] = record
+
+    def get(self, player_id: str) -> Optional[dict]:
+        """Get a player's latest record, pending snapshots win over the database."""
+        with self._lock:
+            if player_id in self._pending:
+                return self._pending[player_id]
+        return SceneRecord._get_collection().find_one({'_id': player_id})
+
+    def load_scene(self, player_id: str) -> Optional[Scene]:
+        """Get a player's latest scene, or None if nothing was saved."""
+        return restore_scene(self.get(player_id))
+
+    def flush(self) -> int:
+        """Write all pending snapshots in one batch, returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            SceneRecord._get_collection().bulk_write(
+                [ReplaceOne({'_id': player_id}, record, upsert=True) for player_id, record in pending.items()],
+                ordered=False,
+            )
+        except Exception:
+            # Requeue for the next flush, unless the player has moved on since
+            with self._lock:
+                for player_id, record in pending.items():
+                    self._pending.setdefault(player_id, record)
+            raise
+        return len(pending)
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # Internal Methods
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Pending snapshots were requeued, try again next interval
+                logger.exception("Flushing scenes failed, %d snapshots requeued", self.pending_count)
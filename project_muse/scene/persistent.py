@@ -0,0 +1,211 @@
+from collections.abc import Mapping, Set
+from typing import Any, Hashable, Iterable, Iterator, Optional
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+HASH_MASK = (1 << 64) - 1
+EMPTY_NODE = (None,) * WIDTH
+
+class _Leaf:
+    __slots__ = ('hash', 'key', 'value')
+
+    def __init__(self, key_hash: int, key: Hashable, value: Any):
+        self.hash = key_hash
+        self.key = key
+        self.value = value
+
+class _Bucket:
+    """Entries whose full hashes collide."""
+    __slots__ = ('hash', 'leaves')
+
+    def __init__(self, key_hash: int, leaves: tuple[_Leaf, ...]):
+        self.hash = key_hash
+        self.leaves = leaves
+
+class PersistentMap(Mapping):
+    """
+    Immutable hash array mapped trie.
+
+    `set` and `delete` return a new map that shares every untouched node with
+    the old one, so an update copies at most one 32 slot node per level and
+    keeping an old version around is free.
+    """
+    __slots__ = ('_root', '_size')
+
+    def __init__(self, root: tuple = EMPTY_NODE, size: int = 0):
+        self._root = root
+        self._size = size
+
+    @classmethod
+    def from_items(cls, items) -> 'PersistentMap':
+        result = cls()
+        for key, value in items:
+            result = result.set(key, value)
+        return result
+
+    # Public Methods
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        key_hash = hash(key) & HASH_MASK
+        node, shift = self._root, 0
+        while True:
+            entry = node[(key_hash >> shift) & MASK]
+            if entry is None:
+                return default
+            if isinstance(entry, _Leaf):
+                return entry.value if entry.key == key else default
+            if isinstance(entry, _Bucket):
+                for leaf in entry.leaves:
+                    if leaf.key == key:
+                        return leaf.value
+                return default
+            node, shift = entry, shift + BITS
+
+    def set(self, key: Hashable, value: Any) -> 'PersistentMap':
+        root, added = _assoc(self._root, 0, _Leaf(hash(key) & HASH_MASK, key, value))
+        if root is self._root:
+            return self
+        return PersistentMap(root, self._size + added)
+
+    def delete(self, key: Hashable) -> 'PersistentMap':
+        if key not in self:
+            return self
+        root = _dissoc(self._root, 0, hash(key) & HASH_MASK, key)
+        return PersistentMap(root if root is not None else EMPTY_NODE, self._size - 1)
+
+    def items(self) -> Iterator[tuple[Hashable, Any]]:
+        for leaf in _iter_leaves(self._root):
+            yield leaf.key, leaf.value
+
+    def keys(self) -> Iterator[Hashable]:
+        return (key for key, _ in self.items())
+
+    def values(self) -> Iterator[Any]:
+        return (value for _, value in self.items())
+
+    # Internal Overrides
+    def __contains__(self, key: Hashable) -> bool:
+        marker = object()
+        return self.get(key, marker) is not marker
+
+    def __getitem__(self, key: Hashable) -> Any:
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+class PersistentSet(Set):
+    """Immutable set on top of a `PersistentMap`, `add` and `discard` return a new set."""
+    __slots__ = ('_map',)
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self._map = items._map if isinstance(items, PersistentSet) else PersistentMap.from_items(
+            (item, True) for item in items
+        )
+
+    @classmethod
+    def _from_iterable(cls, items):
+        # Results of set operators are plain sets, they aren't kept as snapshots
+        return frozenset(items)
+
+    @classmethod
+    def _wrap(cls, items: PersistentMap) -> 'PersistentSet':
+        result = cls.__new__(cls)
+        result._map = items
+        return result
+
+    # Public Methods
+    def add(self, item: Hashable) -> 'PersistentSet':
+        items = self._map.set(item, True)
+        return self if items is self._map else self._wrap(items)
+
+    def discard(self, item: Hashable) -> 'PersistentSet':
+        items = self._map.delete(item)
+        return self if items is self._map else self._wrap(items)
+
+    # Internal Overrides
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._map
+
+    def __iter__(self):
+        return self._map.keys()
+
+    def __len__(self):
+        return len(self._map)
+
+    def __repr__(self):
+        return f"PersistentSet({set(self)!r})"
+
+def _assoc(node: tuple, shift: int, leaf: _Leaf) -> tuple[tuple, int]:
+    """Return (new node, 1 if the key was added else 0)."""
+    index = (leaf.hash >> shift) & MASK
+    entry = node[index]
+    if entry is None:
+        return _replace(node, index, leaf), 1
+
+    if isinstance(entry, _Leaf):
+        if entry.key == leaf.key:
+            if entry.value is leaf.value:
+                return node, 0
+            return _replace(node, index, leaf), 0
+        return _replace(node, index, _merge(shift + BITS, entry, leaf)), 1
+
+    if isinstance(entry, _Bucket):
+        if entry.hash != leaf.hash:
+            return _replace(node, index, _merge(shift + BITS, entry, leaf)), 1
+        leaves = tuple(existing for existing in entry.leaves if existing.key != leaf.key)
+        added = int(len(leaves) == len(entry.leaves))
+        return _replace(node, index, _Bucket(leaf.hash, leaves + (leaf,))), added
+
+    child, added = _assoc(entry, shift + BITS, leaf)
+    if child is entry:
+        return node, 0
+    return _replace(node, index, child), added
+
+def _merge(shift: int, existing, leaf: _Leaf):
+    """Combine two entries with different keys that landed in the same slot."""
+    if existing.hash == leaf.hash:
+        return _Bucket(leaf.hash, (existing, leaf))
+    existing_index = (existing.hash >> shift) & MASK
+    leaf_index = (leaf.hash >> shift) & MASK
+    if existing_index == leaf_index:
+        return _replace(EMPTY_NODE, existing_index, _merge(shift + BITS, existing, leaf))
+    return _replace(_replace(EMPTY_NODE, existing_index, existing), leaf_index, leaf)
+
+def _dissoc(node: tuple, shift: int, key_hash: int, key: Hashable) -> Optional[tuple]:
+    """Return the node without the key, or None once it is empty."""
+    index = (key_hash >> shift) & MASK
+    entry = node[index]
+    if isinstance(entry, _Leaf):
+        replacement = None
+    elif isinstance(entry, _Bucket):
+        leaves = tuple(leaf for leaf in entry.leaves if leaf.key != key)
+        replacement = leaves[0] if len(leaves) == 1 else _Bucket(entry.hash, leaves)
+    else:
+        replacement = _dissoc(entry, shift + BITS, key_hash, key)
+    node = _replace(node, index, replacement)
+    return None if node == EMPTY_NODE else node
+
+def _replace(node: tuple, index: int, entry) -> tuple:
+    return node[:index] + (entry,) + node[index + 1:]
+
+def _iter_leaves(node: tuple) -> Iterator[_Leaf]:
+    for entry in node:
+        if entry is None:
+            continue
+        if isinstance(entry, _Leaf):
+            yield entry
+        elif isinstance(entry, _Bucket):
+            yield from entry.leaves
+        else:
+            yield from _iter_leaves(entry)
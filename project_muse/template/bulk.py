@@ -0,0 +1,275 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from bson import ObjectId
+from typing import Iterable, Iterator, Optional, TextIO, Union
+
+from mongoengine import ValidationError
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ..types import EntityType
+from .entity import EntityTemplate
+from .states import vocabulary
+
+STATE_SEPARATOR = '|'
+ENTITY_TYPE_ALIASES = {'object': EntityType.OBJECT_PROP}
+DUPLICATE_KEY = 11000
+
+@dataclass
+class RowError:
+    """A row that could not be inserted, rows are numbered from 1"""
+    row: int
+    name: Optional[str]
+    message: str
+
+    def __str__(self):
+        return f"row {self.row} ({self.name or 'no name'}): {self.message}"
+
+@dataclass
+class BulkResult:
+    inserted: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+# A CSV row, or an NDJSON line left to `decode_row`
+Row = Union[dict, str]
+
+def read_rows(stream: TextIO, file_format: str) -> Iterator[Row]:
+    """Read entity rows from a CSV or NDJSON stream.
+
+    CSV columns are `name`, `entity_type`, `description` and `possible_states`,
+    with states separated by `|`. NDJSON rows use the same keys, states as a list.
+    NDJSON lines are yielded undecoded, so a malformed line only fails its own row.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    elif file_format in ('ndjson', 'jsonl'):
+        for line in stream:
+            if line.strip():
+                yield line
+    else:
+        raise ValueError(f"Unsupported entity file format {file_format}")
+
+def decode_row(row: Row) -> dict:
+    """Decode an NDJSON line into a row, rejecting anything but a JSON object"""
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    return row
+
+def get_text(row: dict, key: str) -> str:
+    """A text field of a row, missing or null reads as empty"""
+    value = row.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string")
+    return value
+
+def parse_entity_type(value: str) -> EntityType:
+    """Accept an entity type by value, name or tag alias, e.g. `object_prop`, `OBJECT_PROP` or `object`"""
+    value = (value or "").strip()
+    if value.lower() in ENTITY_TYPE_ALIASES:
+        return ENTITY_TYPE_ALIASES[value.lower()]
+    try:
+        return EntityType(value.lower())
+    except ValueError:
+        try:
+            return EntityType[value.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown entity type '{value}'")
+
+def parse_entity_row(row: dict) -> EntityTemplate:
+    """Build and validate an unsaved entity from an uploaded row"""
+    states = row.get('possible_states') or []
+    if isinstance(states, str):
+        states = states.split(STATE_SEPARATOR)
+    if not isinstance(states, list) or not all(isinstance(state, str) for state in states):
+        raise ValueError("possible_states must be a list of strings")
+    name = get_text(row, 'name').strip()
+    if not name:
+        raise ValueError("Missing name")
+    entity = EntityTemplate(
+        name=name,
+        description=get_text(row, 'description'),
+        entity_type=parse_entity_type(get_text(row, 'entity_type')),
+        possible_states=[state.strip() for state in states if state.strip()],
+    )
+    entity.validate()
+    return entity
+
+def bulk_insert_entities(rows: Iterable[Row], batch_size: int = 1000) -> BulkResult:
+    """Validate and insert entity rows in unordered `insert_many` batches.
+
+    Malformed rows, rows with invalid fields, names repeated in the upload or
+    names already in the database are reported in the result instead of
+    stopping the upload.
+    """
+    result = BulkResult()
+    seen = set()
+    batch: list[tuple[int, EntityTemplate]] = []
+
+    for row_num, row in enumerate(rows, 1):
+        try:
+            row = decode_row(row)
+            entity = parse_entity_row(row)
+        except (ValueError, ValidationError) as e:
+            name = row.get('name') if isinstance(row, dict) else None
+            result.errors.append(RowError(row_num, name if isinstance(name, str) else None, str(e)))
+            continue
+        if entity.name in seen:
+            result.errors.append(RowError(row_num, entity.name, "Duplicate name in upload"))
+            continue
+        seen.add(entity.name)
+        batch.append((row_num, entity))
+        if len(batch) >= batch_size:
+            _insert_batch(batch, result)
+            batch = []
+
+    if batch:
+        _insert_batch(batch, result)
+    result.errors.sort(key=lambda error: error.row)
+    return result
+
+def _insert_batch(batch: list[tuple[int, EntityTemplate]], result: BulkResult):
+    collection = EntityTemplate._get_collection()
+    existing = {
+        document['name'] for document in
+        collection.find({'name': {'$in': [entity.name for _, entity in batch]}}, {'name': 1})
+    }
+    to_insert = []
+    for row_num, entity in batch:
+        if entity.name in existing:
+            result.errors.append(RowError(row_num, entity.name, "Name already exists"))
+        else:
+            to_insert.append((row_num, entity))
+    if not to_insert:
+        return
+
+    try:
+        collection.insert_many([entity.to_mongo() for _, entity in to_insert], ordered=False)
+        result.inserted += len(to_insert)
+    except BulkWriteError as e:
+        # Rows written concurrently by someone else surface as duplicate keys here
+        result.inserted += e.details['nInserted']
+        for error in e.details['writeErrors']:
+            row_num, entity = to_insert[error['index']]
+            message = "Name already exists" if error['code'] == DUPLICATE_KEY else error['errmsg']
+            result.errors.append(RowError(row_num, entity.name, message))
+
+def bulk_insert_file(data: bytes, file_name: str, batch_size: int = 1000) -> BulkResult:
+    """Insert entities from uploaded file contents, the format comes from the extension"""
+    file_format = file_name.rsplit('.', 1)[-1].lower()
+    stream = io.StringIO(data.decode('utf-8-sig'))
+    return bulk_insert_entities(read_rows(stream, file_format), batch_size)
+
+@dataclass
+class EditResult:
+    updated: int = 0
+    deleted: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+EDITABLE_FIELDS = ('name', 'description', 'possible_states')
+
+@dataclass
+class GridChanges:
+    """
+    Differences between two versions of an entity grid.
+
+    `edited` maps an entity `_id` to its row number in the edited grid and
+    its changed cells, `deleted` maps an `_id` to its row number in the
+    original grid. `added` holds rows without an `_id`.
+    """
+    edited: dict[str, tuple[int, dict]] = field(default_factory=dict)
+    deleted: dict[str, int] = field(default_factory=dict)
+    added: list[dict] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.edited) + len(self.deleted) + len(self.added)
+
+def diff_grid(original_rows: list[dict], edited_rows: list[dict]) -> GridChanges:
+    """Compare grid rows by their `_id` column, rows are numbered from 1.
+
+    Rows are matched on `_id` rather than position, so sorting, deleting or
+    adding rows never shifts a change onto another entity.
+    """
+    original = {row['_id']: (row_num, row) for row_num, row in enumerate(original_rows, 1)}
+    changes = GridChanges()
+    kept = set()
+    for row_num, row in enumerate(edited_rows, 1):
+        entity_id = row.get('_id')
+        if entity_id not in original:
+            changes.added.append({key: value for key, value in row.items() if key != '_id'})
+            continue
+        kept.add(entity_id)
+        cells = {key: value for key, value in row.items() if value != original[entity_id][1].get(key)}
+        if cells:
+            changes.edited[entity_id] = (row_num, cells)
+    for entity_id, (row_num, _) in original.items():
+        if entity_id not in kept:
+            changes.deleted[entity_id] = row_num
+    return changes
+
+def build_entity_update(changes: dict) -> dict:
+    """Turn the changed cells of a grid row into a `$set` document of stored values
+
+    States are stored as their vocabulary ids.
+    """
+    update = {}
+    for field_name, value in changes.items():
+        if field_name not in EDITABLE_FIELDS:
+            continue
+        if field_name == 'name':
+            value = (value or "").strip()
+            if not value:
+                raise ValueError("Missing name")
+        elif field_name == 'possible_states':
+            if isinstance(value, str):
+                value = value.split(STATE_SEPARATOR)
+            value = vocabulary.get_ids(state.strip() for state in value or [] if state.strip())
+        else:
+            value = value or ""
+        update[field_name] = value
+    return update
+
+def apply_entity_edits(changes: GridChanges) -> EditResult:
+    """Write the edits and deletions of a grid as a single unordered `bulk_write`.
+
+    Operations are filtered on the `_id` each row carries, a grid `_id` is
+    the string of the entity's ObjectId. Only changed fields are `$set`,
+    added rows are left to `bulk_insert_entities`.
+    """
+    result = EditResult()
+    operations, operation_rows = [], []
+
+    for entity_id, (row_num, cells) in changes.edited.items():
+        try:
+            update = build_entity_update(cells)
+        except ValueError as e:
+            result.errors.append(RowError(row_num, cells.get('name'), str(e)))
+            continue
+        if update:
+            update['revision'] = ObjectId()
+            operations.append(UpdateOne({'_id': ObjectId(entity_id)}, {'$set': update}))
+            operation_rows.append((row_num, update.get('name')))
+    for entity_id, row_num in changes.deleted.items():
+        operations.append(DeleteOne({'_id': ObjectId(entity_id)}))
+        operation_rows.append((row_num, None))
+    if not operations:
+        return result
+
+    try:
+        write = EntityTemplate._get_collection().bulk_write(operations, ordered=False)
+        result.updated, result.deleted = write.matched_count, write.deleted_count
+    except BulkWriteError as e:
+        result.updated, result.deleted = e.details['nMatched'], e.details['nRemoved']
+        for error in e.details['writeErrors']:
+            row_num, name = operation_rows[error['index']]
+            message = "Name already exists" if error['code'] == DUPLICATE_KEY else error['errmsg']
+            result.errors.append(RowError(row_num, name, message))
+    return result
@@ -0,0 +1,125 @@
+import math
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Optional
+
+from pymongo.collection import Collection
+
+from ..types import EntityType
+from .entity import EntityTemplate
+from .scene import SceneTemplate
+
+@lru_cache(maxsize=4096)
+def count_assignments(slots: tuple[int, ...], available: tuple[int, ...]) -> int:
+    """Count the distinct ways to fill a template's slots from the catalog.
+
+    Entities can't repeat within a scene, so each entity type contributes the
+    falling permutation P(available, slots), and the types multiply together.
+    Both tuples are ordered by `EntityType`.
+    """
+    return math.prod(math.perm(n, k) for k, n in zip(slots, available))
+
+@dataclass
+class TemplateCapacity:
+    """How a single scene template fares against the current entity catalog.
+
+    Templates without a stored tag index, e.g. legacy ones not migrated yet,
+    are reported as not `indexed`, with no slots and never fillable.
+    """
+    name: str
+    slots: dict[str, int]
+    assignments: int
+    indexed: bool = True
+
+    @property
+    def fillable(self) -> bool:
+        return self.indexed and self.assignments > 0
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'slots': self.slots,
+            'assignments': self.assignments,
+            'fillable': self.fillable,
+            'indexed': self.indexed,
+        }
+
+def get_entity_counts() -> dict[str, int]:
+    """Count entities per entity type with a server side aggregation."""
+    counts = {entity_type.value: 0 for entity_type in EntityType}
+    pipeline = [{'$group': {'_id': '$entity_type', 'count': {'$sum': 1}}}]
+    for row in EntityTemplate._get_collection().aggregate(pipeline):
+        if row['_id'] in counts:
+            counts[row['_id']] = row['count']
+    return counts
+
+# Indexed templates count every entity type, so matching one missing count uses its index
+UNINDEXED_QUERY = {f"tag_counts.{EntityType.CHARACTER.value}": None}
+
+def get_slot_profiles() -> list[dict]:
+    """Group scene template names by their slot counts, using the stored tag index.
+
+    Templates without a tag index are left out, see `get_unindexed_names`.
+    """
+    pipeline = [
+        {'$match': {'tag_counts': {'$exists': True}}},
+        {'$group': {'_id': '$tag_counts', 'names': {'$push': '$name'}}},
+    ]
+    return list(SceneTemplate._get_collection().aggregate(pipeline))
+
+def get_unindexed_names() -> list[str]:
+    """Names of the scene templates saved without a tag index."""
+    cursor = SceneTemplate._get_collection().find(UNINDEXED_QUERY, {'_id': 0, 'name': 1})
+    return [document['name'] for document in cursor]
+
+def get_collection_version(collection: Collection) -> tuple:
+    """A cheap fingerprint that changes whenever documents are added, removed or saved.
+
+    Reads the collection's document count and its newest `_id` and
+    `revision`, the last two through indexes.
+    """
+    def newest(field_name: str):
+        document = collection.find_one({field_name: {'$exists': True}}, {field_name: 1}, sort=[(field_name, -1)])
+        return document[field_name] if document else None
+
+    return collection.estimated_document_count(), newest('_id'), newest('revision')
+
+# (collection versions, report) of the last computed report
+_cached_report: Optional[tuple[tuple, list[TemplateCapacity]]] = None
+
+def get_capacity_report() -> list[TemplateCapacity]:
+    """Report which scene templates the catalog can fill, and in how many ways.
+
+    The report is cached and returned as is until the version of the entity
+    or template collection changes, see `get_collection_version`. Only then
+    are the entity counts and the distinct slot profiles aggregated again.
+    """
+    global _cached_report
+    version = (
+        get_collection_version(EntityTemplate._get_collection()),
+        get_collection_version(SceneTemplate._get_collection()),
+    )
+    if _cached_report is not None and _cached_report[0] == version:
+        return _copy_report(_cached_report[1])
+
+    report = _build_capacity_report()
+    _cached_report = (version, report)
+    return _copy_report(report)
+
+def _copy_report(report: list[TemplateCapacity]) -> list[TemplateCapacity]:
+    """Copies callers can change without touching the cached report."""
+    return [replace(capacity, slots=dict(capacity.slots)) for capacity in report]
+
+def _build_capacity_report() -> list[TemplateCapacity]:
+    entity_counts = get_entity_counts()
+    available = tuple(entity_counts[entity_type.value] for entity_type in EntityType)
+
+    report = []
+    for profile in get_slot_profiles():
+        slots = {entity_type.value: (profile['_id'] or {}).get(entity_type.value, 0) for entity_type in EntityType}
+        assignments = count_assignments(tuple(slots.values()), available)
+        for name in profile['names']:
+            report.append(TemplateCapacity(name, dict(slots), assignments))
+    for name in get_unindexed_names():
+        report.append(TemplateCapacity(name, {}, 0, indexed=False))
+    return sorted(report, key=lambda capacity: capacity.name)
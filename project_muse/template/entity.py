@@ -1,18 +1,41 @@
-from mongoengine import Document, StringField, EnumField, ListField
+from bson import ObjectId
+from mongoengine import Document, StringField, EnumField, ListField, QuerySet, ObjectIdField
 from ..types import EntityType
+from .states import StateField
+
+class EntityTemplateQuerySet(QuerySet):
+    """Queries against the state vocabulary ids stored on entities."""
+
+    def supporting_state(self, entity_type: EntityType, state: str):
+        """Entities of the given type that can be in the given state."""
+        return self.filter(entity_type=entity_type, possible_states=state)
 
 class EntityTemplate(Document):
     """These are meant to persist across scenes"""
     meta = {
         'allow_inheritance': True,
+        'queryset_class': EntityTemplateQuerySet,
         'indexes': [
-            {'fields': ['name'], 'unique': True}
+            {'fields': ['name'], 'unique': True},
+            # Queries through the Document are prefixed with _cls, raw cursors are not
+            ('entity_type', 'name'),
+            {'fields': ['entity_type', 'name'], 'cls': False},
+            {'fields': ['possible_states'], 'cls': False},
+            ('entity_type', 'possible_states'),
+            {'fields': ['revision'], 'cls': False},
         ]
     }
     name = StringField(required=True, unique=True)
     description = StringField(default="")
     entity_type = EnumField(EntityType, required=True)
-    possible_states = ListField(StringField(), default=list)
+    # State names, stored as ids from the shared vocabulary
+    possible_states = ListField(StateField(), default=list)
+    # A fresh ObjectId on every save, lets caches tell when entities changed
+    revision = ObjectIdField()
+
+    def clean(self):
+        """Stamp a new revision, called by mongoengine before every save."""
+        self.revision = ObjectId()
 
     def __str__(self):
         return f"{self.entity_type.value}: {self.name}"
\ No newline at end of file
@@ -0,0 +1,189 @@
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from bson import ObjectId
+from mongoengine import Document, StringField, IntField, DynamicField
+from pymongo import UpdateOne
+
+from .entity import EntityTemplate
+from .scene import SceneTemplate, SceneTemplateSentence, build_tag_index, build_tag_orders
+from .states import vocabulary
+
+# A tag is matched whole, so a terminator inside `{type:name}` doesn't end the sentence
+SENTENCE_PATTERN = re.compile(r'(?:\{[^{}\n]*\}|[^.!?\n])+[.!?]*')
+
+def split_sentences(description: str) -> list[str]:
+    """Split a legacy template description into its sentences.
+
+    A line break always ends a sentence, so unpunctuated lines stay apart.
+    Sentence terminators are kept with the sentence they end, terminators
+    inside a `{type:name}` tag don't end one.
+    """
+    sentences = []
+    for match in SENTENCE_PATTERN.finditer(description or ""):
+        text = match.group().strip()
+        if text and text.strip('.!?'):
+            sentences.append(text)
+    return sentences
+
+def build_sentences(description: str) -> list[SceneTemplateSentence]:
+    """Build the ordered sentence documents for a legacy template description."""
+    return [
+        SceneTemplateSentence(text=text, order=order)
+        for order, text in enumerate(split_sentences(description))
+    ]
+
+class MigrationCheckpoint(Document):
+    """Progress marker for a resumable migration, keyed by migration name."""
+    meta = {'collection': 'migration_checkpoints'}
+    name = StringField(primary_key=True)
+    last_id = DynamicField()
+    migrated = IntField(default=0)
+
+@dataclass
+class MigrationStats:
+    """Progress and throughput of a single migration run."""
+    scanned: int = 0
+    migrated: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"scanned {self.scanned}, migrated {self.migrated} in {self.batches} batches "
+            f"({self.elapsed:.2f}s, {self.docs_per_second:.0f} docs/s)"
+        )
+
+class BatchMigration(ABC):
+    """
+    Base for resumable migrations of the documents of one collection.
+
+    Documents matching `legacy_query` are streamed straight from the
+    collection with a cursor, in `_id` order, and written back with the
+    unordered `bulk_write` batches built by `_build_update`. The last
+    migrated `_id` is checkpointed after every batch so an interrupted run
+    resumes where it stopped.
+    """
+    name: str
+    document: type[Document]
+    legacy_query: dict
+    projection: dict
+
+    def __init__(self, batch_size: int = 500, dry_run: bool = False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.collection = self.document._get_collection()
+
+    # Public Methods
+    def run(self, limit: int = None) -> MigrationStats:
+        """Migrate up to `limit` legacy documents, resuming from the checkpoint."""
+        stats = MigrationStats()
+        checkpoint = self.get_checkpoint()
+        batch, last_id = [], checkpoint.last_id
+
+        for document in self._legacy_documents(checkpoint.last_id):
+            if limit is not None and stats.scanned >= limit:
+                break
+            stats.scanned += 1
+            batch.append(self._build_update(document))
+            last_id = document['_id']
+            if len(batch) >= self.batch_size:
+                self._flush(batch, last_id, checkpoint, stats)
+                batch = []
+
+        if batch:
+            self._flush(batch, last_id, checkpoint, stats)
+        stats.elapsed = time.perf_counter() - stats.started_at
+        return stats
+
+    def get_checkpoint(self) -> MigrationCheckpoint:
+        """Get the stored checkpoint, or a fresh unsaved one."""
+        return MigrationCheckpoint.objects(name=self.name).first() or MigrationCheckpoint(name=self.name)
+
+    def reset(self):
+        """Forget the checkpoint so the next run scans from the start."""
+        MigrationCheckpoint.objects(name=self.name).delete()
+
+    # Internal Methods
+    def _legacy_documents(self, after_id=None):
+        query = dict(self.legacy_query)
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        cursor = self.collection.find(query, projection=self.projection)
+        return cursor.sort('_id', 1).batch_size(self.batch_size)
+
+    @abstractmethod
+    def _build_update(self, document: dict) -> UpdateOne:
+        """The write migrating one legacy document."""
+
+    def _flush(self, batch: list[UpdateOne], last_id, checkpoint: MigrationCheckpoint, stats: MigrationStats):
+        stats.batches += 1
+        if self.dry_run:
+            stats.migrated += len(batch)
+            return
+        result = self.collection.bulk_write(batch, ordered=False)
+        stats.migrated += result.modified_count
+        checkpoint.last_id = last_id
+        checkpoint.migrated += result.modified_count
+        checkpoint.save()
+
+class TemplateDescriptionMigration(BatchMigration):
+    """
+    Converts legacy `template_description` scene templates into `sentences`.
+
+    The old field is read from the raw documents, since `SceneTemplate` no
+    longer declares it.
+    """
+    name = 'scene_template_sentences'
+    document = SceneTemplate
+    legacy_query = {'template_description': {'$exists': True}}
+    projection = {'template_description': 1}
+
+    # Internal Methods
+    def _build_update(self, document: dict) -> UpdateOne:
+        description = document['template_description']
+        sentences = build_sentences(description)
+        tag_keys, tag_counts = build_tag_index(
+            [tag for sentence in sentences for tag in sentence.template_tags]
+        )
+        tag_orders = build_tag_orders(tag_keys, {sentence.order: sentence.template_tags for sentence in sentences})
+        # Matching on the old description skips documents edited since they were read
+        return UpdateOne(
+            {'_id': document['_id'], 'template_description': description},
+            {
+                '$set': {
+                    'sentences': [{'text': s.text, 'order': s.order} for s in sentences],
+                    'tag_keys': tag_keys,
+                    'tag_counts': tag_counts,
+                    'tag_orders': tag_orders,
+                    'revision': ObjectId(),
+                },
+                '$unset': {'template_description': ''},
+            },
+        )
+
+class EntityStateMigration(BatchMigration):
+    """Replaces state names stored on entities with their vocabulary ids."""
+    name = 'entity_state_ids'
+    document = EntityTemplate
+    legacy_query = {'possible_states': {'$type': 'string'}}
+    projection = {'possible_states': 1}
+
+    # Internal Methods
+    def _build_update(self, document: dict) -> UpdateOne:
+        states = document['possible_states']
+        # A dry run writes nothing, so it mustn't grow the vocabulary either
+        state_ids = [
+            state if isinstance(state, int) else vocabulary.get_id(state, create=not self.dry_run)
+            for state in states
+        ]
+        return UpdateOne(
+            {'_id': document['_id'], 'possible_states': states},
+            {'$set': {'possible_states': state_ids}},
+        )
@@ -0,0 +1,102 @@
+import re
+from typing import Iterator, Optional
+
+from ..types import EntityType
+from .entity import EntityTemplate
+from .scene import SceneTemplate
+from .states import StateMatrix, UNKNOWN_STATE, vocabulary
+
+ENTITY_FIELDS = {'_id': 0, 'name': 1, 'entity_type': 1, 'description': 1, 'possible_states': 1}
+TEMPLATE_FIELDS = {'_id': 0, 'name': 1, 'sentences.text': 1, 'sentences.order': 1, 'tag_counts': 1}
+
+ENTITY_SORTS = {
+    'name': [('name', 1)],
+    'type': [('entity_type', 1), ('name', 1)],
+}
+
+def name_prefix_filter(prefix: str) -> dict:
+    """An anchored, escaped regex so the name index can serve the prefix match"""
+    return {'$regex': f"^{re.escape(prefix)}"}
+
+def iter_entities(
+    entity_type: Optional[EntityType] = None,
+    name_prefix: Optional[str] = None,
+    state: Optional[str] = None,
+    sort: str = 'name',
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+) -> Iterator[dict]:
+    """Stream raw entity documents matching the filters, in constant memory.
+
+    Only the listed fields are fetched and documents are pulled from the
+    server `batch_size` at a time. `possible_states` holds state ids, see
+    `vocabulary.get_names`.
+    """
+    query = {}
+    if entity_type is not None:
+        query['entity_type'] = entity_type.value
+    if name_prefix:
+        query['name'] = name_prefix_filter(name_prefix)
+    if state:
+        state_id = vocabulary.get_id(state, create=False)
+        query['possible_states'] = UNKNOWN_STATE if state_id is None else state_id
+
+    if sort not in ENTITY_SORTS:
+        raise ValueError(f"Unknown sort {sort}, expected one of {', '.join(ENTITY_SORTS)}")
+    cursor = EntityTemplate._get_collection().find(query, ENTITY_FIELDS).sort(ENTITY_SORTS[sort])
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor.batch_size(batch_size)
+
+def iter_templates(
+    name_prefix: Optional[str] = None,
+    entity_type: Optional[EntityType] = None,
+    limit: Optional[int] = None,
+    batch_size: int = 100,
+    fields: dict = TEMPLATE_FIELDS,
+) -> Iterator[dict]:
+    """Stream raw scene template documents, optionally only those using an entity type."""
+    query = {}
+    if name_prefix:
+        query['name'] = name_prefix_filter(name_prefix)
+    if entity_type is not None:
+        query[f"tag_counts.{entity_type.value}"] = {'$gt': 0}
+
+    cursor = SceneTemplate._get_collection().find(query, fields).sort('name', 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor.batch_size(batch_size)
+
+def load_state_matrix(entity_type: Optional[EntityType] = None) -> StateMatrix:
+    """Build a `StateMatrix` of every entity, or those of one type, from a raw cursor."""
+    query = {'entity_type': entity_type.value} if entity_type is not None else {}
+    cursor = EntityTemplate._get_collection().find(
+        query, {'_id': 0, 'name': 1, 'entity_type': 1, 'possible_states': 1}
+    )
+    return StateMatrix(cursor.sort(ENTITY_SORTS['type']))
+
+def get_sentence_count(name: str) -> Optional[int]:
+    """Number of sentences of a scene template, counted on the server, or None if it doesn't exist."""
+    result = list(SceneTemplate._get_collection().aggregate([
+        {'$match': {'name': name}},
+        {'$project': {'_id': 0, 'count': {'$size': {'$ifNull': ['$sentences', []]}}}},
+    ]))
+    return result[0]['count'] if result else None
+
+def get_stored_tag_index(name: str) -> tuple[list[str], list[int]]:
+    """The denormalized tag keys and tag orders of a scene template, projected so no sentence is sent."""
+    document = SceneTemplate._get_collection().find_one({'name': name}, {'_id': 0, 'tag_keys': 1, 'tag_orders': 1})
+    if document is None:
+        return [], []
+    return document.get('tag_keys', []), document.get('tag_orders', [])
+
+def get_sentence_window(name: str, start: int, count: int) -> list[dict]:
+    """Raw sentences `start` to `start + count` of a scene template, fetched with `$slice`.
+
+    Only the window is sent by the server, whatever the template's length.
+    """
+    document = SceneTemplate._get_collection().find_one(
+        {'name': name},
+        {'_id': 0, 'tag_keys': 0, 'tag_counts': 0, 'tag_orders': 0, 'sentences': {'$slice': [start, count]}},
+    )
+    return document.get('sentences', []) if document else []
@@ -0,0 +1,228 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Union
+
+from mongoengine import QuerySet
+
+from ..types import EntityType
+from .entity import EntityTemplate
+from .query import get_sentence_count, get_sentence_window, get_stored_tag_index
+from .scene import SceneTemplate, SceneTemplateTag, get_first_orders, parse_template_tags
+from .states import vocabulary
+
+@dataclass(frozen=True, slots=True)
+class EntityRecord:
+    """Read-only entity decoded straight from a raw document."""
+    name: str
+    entity_type: EntityType
+    description: str = ""
+    possible_states: tuple[str, ...] = ()
+
+    def __str__(self):
+        return f"{self.entity_type.value}: {self.name}"
+
+@dataclass(frozen=True, slots=True)
+class SentenceRecord:
+    text: str
+    order: int
+
+    @property
+    def template_tags(self) -> list[SceneTemplateTag]:
+        return parse_template_tags(self.text)
+
+    def __str__(self):
+        return self.text
+
+@dataclass(frozen=True, slots=True)
+class TemplateRecord:
+    """
+    Read-only scene template decoded straight from a raw document.
+
+    Offers the read methods of `SceneTemplate`, so it can back a `Scene`.
+    Tags are parsed when asked for, nothing is cached.
+    """
+    name: str
+    sentences: tuple[SentenceRecord, ...] = ()
+
+    def get_sentences(self) -> tuple[SentenceRecord, ...]:
+        return self.sentences
+
+    def get_full_template_description(self) -> str:
+        return "\n".join([str(sentence) for sentence in self.sentences])
+
+    def get_sentence_by_order(self, order: int) -> SentenceRecord:
+        return self.sentences[order]
+
+    def get_window(self, start: int, stop: Optional[int] = None) -> tuple[SentenceRecord, ...]:
+        return self.sentences[start:stop]
+
+    def get_template_tags(self) -> list[SceneTemplateTag]:
+        return [tag for sentence in self.sentences for tag in sentence.template_tags]
+
+    def get_tags_by_sentence(self) -> dict[int, list[SceneTemplateTag]]:
+        return {sentence.order: sentence.template_tags for sentence in self.sentences}
+
+    def get_tag_orders(self) -> dict[str, int]:
+        return get_first_orders(self.get_tags_by_sentence())
+
+    def __str__(self):
+        return self.name
+
+class LazyTemplate:
+    """
+    Read-only scene template that pages its sentences in on demand.
+
+    Opening one only counts its sentences on the server. Sentences are
+    fetched a page of `page_size` at a time with a `$slice` projection, and
+    at most `max_pages` pages are kept, so memory doesn't grow with the
+    template. Offers the read methods of `SceneTemplate`, methods over every
+    sentence page through the whole template, except `get_template_tags`
+    and `get_tag_orders` which read the stored tag index.
+    """
+    __slots__ = ('name', 'page_size', 'max_pages', '_count', '_pages', '_tag_index')
+
+    def __init__(self, name: str, page_size: int = 20, max_pages: int = 4):
+        count = get_sentence_count(name)
+        if count is None:
+            raise ValueError(f"Unknown scene template {name}")
+        self.name = name
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._count = count
+        self._pages: OrderedDict[int, tuple[SentenceRecord, ...]] = OrderedDict()
+        self._tag_index: Optional[tuple[list[str], list[int]]] = None
+
+    # Public Methods
+    def get_page(self, page: int) -> tuple[SentenceRecord, ...]:
+        """Sentences of one page, fetched unless among the last `max_pages` read."""
+        if page in self._pages:
+            self._pages.move_to_end(page)
+            return self._pages[page]
+        sentences = tuple(
+            SentenceRecord(sentence['text'], sentence['order'])
+            for sentence in get_sentence_window(self.name, page * self.page_size, self.page_size)
+        )
+        self._pages[page] = sentences
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return sentences
+
+    def get_window(self, start: int, stop: Optional[int] = None) -> list[SentenceRecord]:
+        """Sentences from `start` up to `stop`, loading only the pages they span."""
+        stop = self._count if stop is None else stop
+        start, stop = max(start, 0), min(stop, self._count)
+        if stop <= start:
+            return []
+        sentences = []
+        for page in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            offset = page * self.page_size
+            for position, sentence in enumerate(self.get_page(page), offset):
+                if start <= position < stop:
+                    sentences.append(sentence)
+        return sentences
+
+    @property
+    def page_count(self) -> int:
+        return -(-self._count // self.page_size)
+
+    def get_sentences(self) -> list[SentenceRecord]:
+        return list(self)
+
+    def get_full_template_description(self) -> str:
+        return "\n".join([str(sentence) for sentence in self])
+
+    def get_sentence_by_order(self, order: int) -> SentenceRecord:
+        if not 0 <= order < self._count:
+            raise IndexError(f"Order {order} is out of bounds for scene template {self.name}")
+        return self.get_page(order // self.page_size)[order % self.page_size]
+
+    def get_template_tags(self) -> list[SceneTemplateTag]:
+        """Distinct tags of the template, from its stored tag keys with one query and no sentences.
+
+        Unlike `SceneTemplate.get_template_tags`, a tag repeated across sentences is listed once.
+        """
+        tag_keys, _ = self._get_tag_index()
+        return [SceneTemplateTag.from_key(key) for key in tag_keys]
+
+    def get_tag_orders(self) -> dict[str, int]:
+        """Order of the first sentence each tag key appears in, from the stored tag index.
+
+        Templates saved before tag orders were stored are paged through instead.
+        """
+        tag_keys, tag_orders = self._get_tag_index()
+        if len(tag_orders) != len(tag_keys):
+            return get_first_orders(self.get_tags_by_sentence())
+        return dict(zip(tag_keys, tag_orders))
+
+    def get_tags_by_sentence(self, start: int = 0, stop: Optional[int] = None) -> dict[int, list[SceneTemplateTag]]:
+        """Tags grouped by sentence order, of every sentence or only those in a window."""
+        return {sentence.order: sentence.template_tags for sentence in self.get_window(start, stop)}
+
+    # Internal Methods
+    def _get_tag_index(self) -> tuple[list[str], list[int]]:
+        if self._tag_index is None:
+            self._tag_index = get_stored_tag_index(self.name)
+        return self._tag_index
+
+    # Internal Overrides
+    def __iter__(self) -> Iterator[SentenceRecord]:
+        for page in range(self.page_count):
+            yield from self.get_page(page)
+
+    def __len__(self):
+        return self._count
+
+    def __str__(self):
+        return self.name
+
+Record = Union[EntityRecord, TemplateRecord]
+
+def entity_from_son(son: dict) -> EntityRecord:
+    return EntityRecord(
+        name=son['name'],
+        entity_type=EntityType(son['entity_type']),
+        description=son.get('description') or "",
+        possible_states=tuple(
+            state if isinstance(state, str) else vocabulary.get_name(state)
+            for state in son.get('possible_states', ())
+        ),
+    )
+
+def template_from_son(son: dict) -> TemplateRecord:
+    return TemplateRecord(
+        name=son['name'],
+        sentences=tuple(
+            SentenceRecord(sentence['text'], sentence['order'])
+            for sentence in sorted(son.get('sentences', ()), key=lambda s: s['order'])
+        ),
+    )
+
+DECODERS: dict[type, Callable[[dict], Record]] = {
+    EntityTemplate: entity_from_son,
+    SceneTemplate: template_from_son,
+}
+
+def from_son(document: type, son: dict) -> Record:
+    """Decode a raw document of `EntityTemplate` or `SceneTemplate` into its record."""
+    return DECODERS[document](son)
+
+def as_records(queryset: QuerySet, *fields: str) -> Iterator[Record]:
+    """Run a queryset in read-only mode, yielding records instead of Documents.
+
+    Documents are fetched with `as_pymongo`, limited to `fields` if given, so
+    no field validation, change tracking or `_cls` dispatch takes place.
+    Fields left out get their record defaults.
+    """
+    decode = DECODERS[queryset._document]
+    if fields:
+        queryset = queryset.only(*fields)
+    return (decode(son) for son in queryset.as_pymongo())
+
+def load_entity_records(entity_type: Optional[EntityType] = None, *fields: str) -> list[EntityRecord]:
+    """Every entity, or those of one type, as records sorted by name."""
+    queryset = EntityTemplate.objects(entity_type=entity_type) if entity_type else EntityTemplate.objects
+    return list(as_records(queryset.order_by('name'), *fields))
+
+def load_template_records() -> list[TemplateRecord]:
+    """Every scene template as records sorted by name."""
+    return list(as_records(SceneTemplate.objects.order_by('name'), 'name', 'sentences'))
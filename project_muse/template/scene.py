@@ -1,4 +1,10 @@
-from mongoengine import Document, StringField, ListField, EmbeddedDocumentField, IntField, EmbeddedDocument
+from typing import Optional
+
+from bson import ObjectId
+from mongoengine import (
+    Document, StringField, ListField, EmbeddedDocumentField, IntField, EmbeddedDocument,
+    DictField, QuerySet, ObjectIdField,
+)
 from ..types import EntityType
 
 class SceneTemplateTag:
@@ -9,12 +15,56 @@ class SceneTemplateTag:
         self.entity_type = entity_type
         self.tag_name = tag_name
 
+    @classmethod
+    def from_key(cls, key: str) -> 'SceneTemplateTag':
+        """Build a tag back from its `type:name` key, see `build_tag_index`."""
+        entity_type, tag_name = key.split(':', 1)
+        return cls(EntityType(entity_type), tag_name)
+
     def __str__(self):
         return f"{self.entity_type.value}:{self.tag_name}"
     
     def __repr__(self):
         return self.__str__()
 
+    def is_valid_option(self, entity) -> bool:
+        """Check if the given entity can fill this tag."""
+        return entity.entity_type == self.entity_type
+
+def parse_template_tags(text: str) -> list[SceneTemplateTag]:
+    """Parse the template tags from a sentence string.
+    
+    tags are formatted as {entity_type:tag_name}
+    """
+    tags = []
+    current_pos = 0
+    
+    while True:
+        start = text.find('{', current_pos)
+        if start == -1:
+            break
+            
+        end = text.find('}', start)
+        if end == -1:
+            break
+            
+        tag_content = text[start + 1:end]
+        try:
+            entity_type_str, tag_name = tag_content.split(':')
+            try:
+                entity_type = EntityType(entity_type_str)
+                tags.append(SceneTemplateTag(entity_type, tag_name))
+            except ValueError:
+                # Invalid entity type
+                pass
+        except ValueError:
+            # Malformed tag
+            pass
+            
+        current_pos = end + 1
+        
+    return tags
+
 class SceneTemplateSentence(EmbeddedDocument):
     """
     Represents a sentence in a scene template. 
@@ -27,6 +77,15 @@ class SceneTemplateSentence(EmbeddedDocument):
     def __init__(self, *args, **kwargs):
         self._template_tags = None
         super().__init__(*args, **kwargs)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == 'text':
+            # Only this sentence needs reparsing, let the owning template know
+            self._template_tags = None
+            instance = getattr(self, '_instance', None)
+            if isinstance(instance, SceneTemplate):
+                instance._mark_sentence_dirty(self)
     
     @property
     def template_tags(self) -> list[SceneTemplateTag]:
@@ -36,38 +95,7 @@ class SceneTemplateSentence(EmbeddedDocument):
         return self._template_tags
 
     def _parse_template_tags(self) -> list[SceneTemplateTag]:
-        """Parse the template tags from the sentence string.
-        
-        tags are formatted as {entity_type:tag_name}
-        """
-        tags = []
-        current_pos = 0
-        
-        while True:
-            start = self.text.find('{', current_pos)
-            if start == -1:
-                break
-                
-            end = self.text.find('}', start)
-            if end == -1:
-                break
-                
-            tag_content = self.text[start + 1:end]
-            try:
-                entity_type_str, tag_name = tag_content.split(':')
-                try:
-                    entity_type = EntityType(entity_type_str)
-                    tags.append(SceneTemplateTag(entity_type, tag_name))
-                except ValueError:
-                    # Invalid entity type
-                    pass
-            except ValueError:
-                # Malformed tag
-                pass
-                
-            current_pos = end + 1
-            
-        return tags
+        return parse_template_tags(self.text)
 
     def __str__(self):
         return self.text
@@ -75,31 +103,94 @@ class SceneTemplateSentence(EmbeddedDocument):
     def __repr__(self):
         return f"{self.order}: {self.text}"
     
-    def __iter__(self):
-        return iter(self.template_tags)
-    
     def __getitem__(self, index: int):
         return self.template_tags[index]
 
+def build_tag_index(tags: list[SceneTemplateTag]) -> tuple[list[str], dict[str, int]]:
+    """Build the distinct tag keys and per entity type slot counts for a list of tags.
+
+    A tag name repeated across sentences is a single slot, so it is counted once.
+    Every entity type gets a count, even if zero, so range queries match it.
+    """
+    tag_keys = list(dict.fromkeys(str(tag) for tag in tags))
+    tag_counts = {entity_type.value: 0 for entity_type in EntityType}
+    for key in tag_keys:
+        tag_counts[key.split(':', 1)[0]] += 1
+    return tag_keys, tag_counts
+
+def get_first_orders(tags_by_sentence: dict[int, list[SceneTemplateTag]]) -> dict[str, int]:
+    """Order of the first sentence each tag key appears in."""
+    orders = {}
+    for order, tags in sorted(tags_by_sentence.items()):
+        for tag in tags:
+            orders.setdefault(str(tag), order)
+    return orders
+
+def build_tag_orders(tag_keys: list[str], tags_by_sentence: dict[int, list[SceneTemplateTag]]) -> list[int]:
+    """First sentence order of each of `tag_keys`, stored alongside them."""
+    orders = get_first_orders(tags_by_sentence)
+    return [orders[key] for key in tag_keys]
+
+class SceneTemplateQuerySet(QuerySet):
+    """Server side queries against the denormalized tag index."""
+
+    def using_tag(self, entity_type: EntityType, tag_name: str = None):
+        """Templates with a tag of the given type, or the exact tag if a name is given."""
+        if tag_name is not None:
+            return self.filter(tag_keys=f"{entity_type.value}:{tag_name}")
+        return self.filter(**{f"tag_counts__{entity_type.value}__gt": 0})
+
+    def requiring_at_most(self, max_counts: dict[EntityType, int]):
+        """Templates needing no more than the given number of slots per entity type."""
+        return self.filter(**{
+            f"tag_counts__{entity_type.value}__lte": count
+            for entity_type, count in max_counts.items()
+        })
+
 class SceneTemplate(Document):
     """
     Represents a full scene template and correlates with a level.
 
     Comprised of sentences that the user will fill in with an entity.
     """
-    name = StringField(required=True)
+    meta = {
+        'queryset_class': SceneTemplateQuerySet,
+        'indexes': [
+            'tag_keys',
+            *[f"tag_counts.{entity_type.value}" for entity_type in EntityType],
+            'revision',
+        ]
+    }
+    name = StringField(required=True, unique=True)
     sentences = ListField(EmbeddedDocumentField(SceneTemplateSentence))
 
+    # Denormalized from sentences on save, see `build_tag_index`
+    tag_keys = ListField(StringField())
+    tag_counts = DictField(IntField())
+    # First sentence order of each tag key, see `build_tag_orders`
+    tag_orders = ListField(IntField())
+    # A fresh ObjectId on every save, lets caches tell when templates changed
+    revision = ObjectIdField()
+
+    def __init__(self, *args, **kwargs):
+        self._sentence_tags = None
+        super().__init__(*args, **kwargs)
+
     # Public Methods
     def add_sentence(self, text: str):
         """Add a new sentence to the template."""
         order = len(self.sentences)
         sentence = SceneTemplateSentence(text=text, order=order)
+        sentence_tags = self._sentence_tags
         self.sentences.append(sentence)
+        # The append drops the caches, see `_mark_as_changed`, but only the new sentence is missing
+        if sentence_tags is not None and len(sentence_tags) == order:
+            self._sentence_tags = sentence_tags
+            self._append_sentence_tags(sentence)
         self.save()
 
     def update_sentence(self, order: int, text: str):
-        """Update an existing sentence."""
+        """Update an existing sentence, only its tags are parsed again."""
         if order >= len(self.sentences):
             raise IndexError(f"Order {order} is out of bounds for scene template {self.name}")
         self.sentences[order].text = text
@@ -113,21 +204,98 @@ class SceneTemplate(Document):
     
     def get_sentence_by_order(self, order: int) -> SceneTemplateSentence:
         return self.sentences[order]
+
+    def get_window(self, start: int, stop: Optional[int] = None) -> list[SceneTemplateSentence]:
+        return self.sentences[start:stop]
     
     def get_template_tags(self) -> list[SceneTemplateTag]:
-        """Get all template tags across all sentences."""
-        return [tag for sentence in self.sentences for tag in sentence.template_tags]
+        """Get all template tags across all sentences.
+
+        The list is cached and patched in place as sentences change, don't mutate it.
+        """
+        self._refresh_tags()
+        return self._template_tags
 
     def get_tags_by_sentence(self) -> dict[int, list[SceneTemplateTag]]:
-        """Group template tags by sentence order."""
-        return {sentence.order: sentence.template_tags for sentence in self.sentences}
+        """Group template tags by sentence order, cached like `get_template_tags`."""
+        self._refresh_tags()
+        return self._tags_by_sentence
+
+    def get_tag_orders(self) -> dict[str, int]:
+        """Order of the first sentence each tag key appears in."""
+        return get_first_orders(self.get_tags_by_sentence())
+
+    # Internal Methods
+    def _rebuild_tags(self):
+        """Parse every sentence and build the aggregated tag caches from scratch."""
+        self._sentence_tags = []
+        self._template_tags = []
+        self._tag_offsets = []
+        self._tags_by_sentence = {}
+        self._tracked_sentences = []
+        self._sentence_positions = {}
+        self._dirty_sentences = {}
+        for sentence in self.sentences:
+            self._append_sentence_tags(sentence)
+
+    def _append_sentence_tags(self, sentence: SceneTemplateSentence):
+        tags = sentence.template_tags
+        # Holding the sentence keeps its id from being reused while it's tracked
+        self._tracked_sentences.append(sentence)
+        self._sentence_positions[id(sentence)] = len(self._sentence_tags)
+        self._tag_offsets.append(len(self._template_tags))
+        self._sentence_tags.append(tags)
+        self._template_tags.extend(tags)
+        self._tags_by_sentence[sentence.order] = tags
+
+    def _mark_sentence_dirty(self, sentence: SceneTemplateSentence):
+        if self._sentence_tags is not None:
+            self._dirty_sentences[id(sentence)] = sentence
+
+    def _refresh_tags(self):
+        """Reparse only the sentences edited since the last call."""
+        if self._sentence_tags is None or len(self._sentence_tags) != len(self.sentences):
+            self._rebuild_tags()
+            return
+        dirty, self._dirty_sentences = self._dirty_sentences, {}
+        for key, sentence in dirty.items():
+            position = self._sentence_positions.get(key)
+            if position is None or self.sentences[position] is not sentence:
+                self._rebuild_tags()
+                return
+
+            old_tags, new_tags = self._sentence_tags[position], sentence.template_tags
+            start = self._tag_offsets[position]
+            self._template_tags[start:start + len(old_tags)] = new_tags
+            shift = len(new_tags) - len(old_tags)
+            if shift:
+                for later in range(position + 1, len(self._tag_offsets)):
+                    self._tag_offsets[later] += shift
+            self._sentence_tags[position] = new_tags
+            self._tags_by_sentence[sentence.order] = new_tags
 
     # Internal Overrides
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == 'sentences':
+            # A replaced sentence list can't be patched, rebuild on next read
+            self._sentence_tags = None
+
+    def _mark_as_changed(self, key):
+        super()._mark_as_changed(key)
+        # The sentence list reports its own changes, e.g. `sentences[i] = ...` as `sentences.i`
+        # and appends, removals or reorders as `sentences`, none of which can be patched
+        if key == 'sentences' or (key or '').startswith('sentences.'):
+            self._sentence_tags = None
+
+    def clean(self):
+        """Refresh the tag index, called by mongoengine before every save."""
+        self.tag_keys, self.tag_counts = build_tag_index(self.get_template_tags())
+        self.tag_orders = build_tag_orders(self.tag_keys, self.get_tags_by_sentence())
+        self.revision = ObjectId()
+
     def __str__(self):
         return self.name
     
     def __repr__(self):
         return self.__str__()
-    
-    def __iter__(self):
-        return iter(self.sentences)
@@ -0,0 +1,172 @@
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+from mongoengine import Document, IntField, StringField
+from mongoengine.base import BaseField
+from pymongo.errors import DuplicateKeyError
+
+from ..types import EntityType
+
+# Stored in place of a state that isn't in the vocabulary, so queries match nothing
+UNKNOWN_STATE = -1
+
+ENTITY_TYPES = list(EntityType)
+
+class EntityState(Document):
+    """A state name shared by every entity that can be in it, stored once."""
+    meta = {'collection': 'entity_states'}
+    state_id = IntField(primary_key=True)
+    name = StringField(required=True, unique=True)
+
+class StateVocabulary:
+    """
+    Process wide mapping between state names and their integer ids.
+
+    Ids are allocated in the `entity_states` collection on first use. The
+    unique `_id` and `name` make allocation safe across processes, a writer
+    losing a race reloads the vocabulary and retries.
+    """
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    # Public Methods
+    def load(self):
+        """Read the whole vocabulary from the database."""
+        with self._lock:
+            self._load()
+
+    def get_id(self, name: str, create: bool = True) -> Optional[int]:
+        """Id of a state name, allocating one if `create` is set and it's new."""
+        if name in self.ids:
+            return self.ids[name]
+        with self._lock:
+            self._load()
+            while name not in self.ids and create:
+                state_id = max(self.names, default=UNKNOWN_STATE) + 1
+                try:
+                    EntityState._get_collection().insert_one({'_id': state_id, 'name': name})
+                except DuplicateKeyError:
+                    self._load()
+                    continue
+                self._add(state_id, name)
+        return self.ids.get(name)
+
+    def get_ids(self, names: Iterable[str], create: bool = True) -> list[int]:
+        return [self.get_id(name, create) for name in names]
+
+    def get_name(self, state_id: int) -> Optional[str]:
+        if state_id not in self.names:
+            self.load()
+        return self.names.get(state_id)
+
+    def get_names(self, state_ids: Iterable[int]) -> list[str]:
+        return [self.get_name(state_id) for state_id in state_ids]
+
+    def clear(self):
+        """Forget the cached vocabulary, it's read again on next use."""
+        with self._lock:
+            self.ids, self.names = {}, {}
+
+    # Internal Methods
+    def _load(self):
+        for document in EntityState._get_collection().find():
+            self._add(document['_id'], document['name'])
+
+    def _add(self, state_id: int, name: str):
+        self.ids[name] = state_id
+        self.names[state_id] = name
+
+vocabulary = StateVocabulary()
+
+def decode_state_names(son: dict) -> dict:
+    """A raw entity with its state ids replaced by their names, readable without the vocabulary."""
+    states = son.get('possible_states')
+    if not states:
+        return son
+    return {
+        **son,
+        'possible_states': [state if isinstance(state, str) else vocabulary.get_name(state) for state in states],
+    }
+
+class StateField(BaseField):
+    """
+    A state name in Python, stored as its vocabulary id.
+
+    Names still stored as strings by older versions are read as they are,
+    see `encode_entity_states`.
+    """
+
+    def to_mongo(self, value):
+        if isinstance(value, str):
+            return vocabulary.get_id(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return vocabulary.get_name(value)
+        return value
+
+    def validate(self, value):
+        if not isinstance(value, str):
+            self.error("State must be a string")
+
+    def prepare_query_value(self, op, value):
+        if isinstance(value, (list, tuple, set)):
+            return [self.prepare_query_value(op, v) for v in value]
+        if isinstance(value, str):
+            state_id = vocabulary.get_id(value, create=False)
+            return UNKNOWN_STATE if state_id is None else state_id
+        return value
+
+class StateMatrix:
+    """
+    Bit packed entity by state matrix for filtering a catalog in memory.
+
+    Row `i` is `names[i]`, bit `j` of a row is set if the entity supports
+    the state with vocabulary id `j`. A catalog of 100k entities and 64
+    states fits in under 1MB.
+    """
+
+    def __init__(self, documents: Iterable[dict]):
+        names, entity_types, rows = [], [], []
+        for document in documents:
+            names.append(document['name'])
+            entity_types.append(ENTITY_TYPES.index(EntityType(document['entity_type'])))
+            rows.append([
+                state if isinstance(state, int) else vocabulary.get_id(state, create=False)
+                for state in document.get('possible_states', [])
+            ])
+
+        self.names = names
+        self.entity_types = np.array(entity_types, dtype=np.int8)
+        width = max((state for row in rows for state in row if state is not None), default=-1) + 1
+        dense = np.zeros((len(rows), width), dtype=bool)
+        for position, row in enumerate(rows):
+            dense[position, [state for state in row if state is not None]] = True
+        self.width = width
+        self.bits = np.packbits(dense, axis=1)
+
+    # Public Methods
+    def supports(self, state: str) -> np.ndarray:
+        """Boolean mask of the entities that support a state."""
+        state_id = vocabulary.get_id(state, create=False)
+        if state_id is None or state_id >= self.width:
+            return np.zeros(len(self.names), dtype=bool)
+        column = self.bits[:, state_id // 8]
+        return (column >> (7 - state_id % 8) & 1).astype(bool)
+
+    def filter(self, entity_type: Optional[EntityType] = None, states: Iterable[str] = ()) -> list[str]:
+        """Names of the entities of a type, if given, that support every state."""
+        mask = np.ones(len(self.names), dtype=bool)
+        if entity_type is not None:
+            mask &= self.entity_types == ENTITY_TYPES.index(entity_type)
+        for state in states:
+            mask &= self.supports(state)
+        return [self.names[position] for position in np.flatnonzero(mask)]
+
+    def __len__(self):
+        return len(self.names)
@@ -1,6 +1,7 @@
-from invoke import task
+from invoke import task, Exit
 from project_muse.db import init_db
 from project_muse.template import SceneTemplate
+from project_muse.template.migration import TemplateDescriptionMigration, build_sentences
 
 @task
 def init(c):
@@ -24,10 +25,76 @@ def add_scene_template(c, name, template):
     init_db()
     scene_template = SceneTemplate(
         name=name,
-        template_description=template,
+        sentences=build_sentences(template),
     ).save()
     print(f"Created scene template: {scene_template.name}")
 
+@task
+def migrate_templates(c, batch_size=500, limit=None, dry_run=False, reset=False):
+    """Convert legacy template_description scene templates into sentences
+
+    Resumes from the last checkpoint unless --reset is given.
+
+    Example:
+        invoke migrate-templates --batch-size 1000 --dry-run
+    """
+    init_db()
+    migration = TemplateDescriptionMigration(batch_size=int(batch_size), dry_run=dry_run)
+    if reset:
+        migration.reset()
+    stats = migration.run(limit=int(limit) if limit is not None else None)
+    prefix = "Dry run: " if dry_run else ""
+    print(f"{prefix}{stats}")
+
+@task
+def migrate_states(c, batch_size=500, limit=None, dry_run=False, reset=False):
+    """Store entity state names as ids from the shared state vocabulary
+
+    Resumes from the last checkpoint unless --reset is given.
+
+    Example:
+        invoke migrate-states --batch-size 1000
+    """
+    init_db()
+    from project_muse.template.migration import EntityStateMigration
+
+    migration = EntityStateMigration(batch_size=int(batch_size), dry_run=dry_run)
+    if reset:
+        migration.reset()
+    stats = migration.run(limit=int(limit) if limit is not None else None)
+    prefix = "Dry run: " if dry_run else ""
+    print(f"{prefix}{stats}")
+
+@task
+def reindex_templates(c):
+    """Rebuild the tag index stored on every scene template"""
+    init_db()
+    count = 0
+    for template in SceneTemplate.objects.all():
+        template.save()
+        count += 1
+    print(f"Reindexed {count} scene templates")
+
+@task
+def capacity_report(c, fillable_only=False, json_output=False):
+    """Report which scene templates the entity catalog can fill, and in how many ways"""
+    init_db()
+    import json
+    from project_muse.template.capacity import get_capacity_report
+
+    report = [capacity for capacity in get_capacity_report() if capacity.fillable or not fillable_only]
+    if json_output:
+        print(json.dumps([capacity.to_dict() for capacity in report], indent=2))
+        return
+
+    for capacity in report:
+        slots = ", ".join(f"{count} {entity_type}" for entity_type, count in capacity.slots.items() if count)
+        if not capacity.indexed:
+            status = "not indexed, run migrate-templates"
+        else:
+            status = f"{capacity.assignments} assignments" if capacity.fillable else "cannot be filled"
+        print(f"- {capacity.name} ({slots or 'no slots'}): {status}")
+
 @task
 def add_character(c, name, description=""):
     """Add a new character template to the database"""
@@ -57,45 +124,147 @@ def add_creature(c, name, description=""):
     print(f"Created creature: {creature.name}")
 
 @task
-def list_templates(c):
-    """List all scene templates in the database"""
+def add_entities(c, file, batch_size=1000):
+    """Bulk add entities from a CSV or NDJSON file
+
+    CSV columns are name, entity_type, description and possible_states,
+    with states separated by "|".
+
+    Example:
+        invoke add-entities --file entities.csv
+    """
+    init_db()
+    from project_muse.template.bulk import bulk_insert_file
+
+    with open(file, 'rb') as f:
+        result = bulk_insert_file(f.read(), file, int(batch_size))
+    for error in result.errors:
+        print(f"- {error}")
+    print(f"Created {result.inserted} entities, {len(result.errors)} rows failed")
+
+@task
+def list_templates(c, name_prefix=None, entity_type=None, limit=None, ndjson=False, batch_size=100):
+    """List scene templates, streamed from the database
+
+    Example:
+        invoke list-templates --entity-type creature --ndjson
+    """
     init_db()
-    templates = SceneTemplate.objects.all()
+    import json
+    from project_muse.template.bulk import parse_entity_type
+    from project_muse.template.query import iter_templates
+
+    templates = iter_templates(
+        name_prefix=name_prefix,
+        entity_type=parse_entity_type(entity_type) if entity_type else None,
+        limit=int(limit) if limit else None,
+        batch_size=int(batch_size),
+    )
     for template in templates:
-        print(f"\nTemplate: {template.name}")
-        print(f"Description: {template.template_description}")
-        print(f"Template: {template.template}")
-
-@task
-def list_entities(c, entity_type=None):
-    """List all entities in the database, optionally filtered by type"""
-    init_db()
-    if entity_type == 'creature':
-        entities = CreatureTemplate.objects.all()
-    elif entity_type == 'character':
-        entities = CharacterTemplate.objects.all()
-    elif entity_type == 'object':
-        entities = ObjectPropTemplate.objects.all()
-    elif entity_type == 'landmark':
-        entities = LandmarkTemplate.objects.all()
-    else:
-        # List all entities
-        print("\nCharacters:")
-        for entity in CharacterTemplate.objects.all():
-            print(f"- {entity.name}: {entity.description}")
-        print("\nCreatures:")
-        for entity in CreatureTemplate.objects.all():
-            print(f"- {entity.name}: {entity.description}")
-        print("\nObjects:")
-        for entity in ObjectPropTemplate.objects.all():
-            print(f"- {entity.name}: {entity.description}")
-        print("\nLandmarks:")
-        for entity in LandmarkTemplate.objects.all():
-            print(f"- {entity.name}: {entity.description}")
-        return
+        if ndjson:
+            print(json.dumps(template))
+            continue
+        print(f"\nTemplate: {template['name']}")
+        for sentence in sorted(template.get('sentences', []), key=lambda s: s['order']):
+            print(f"  {sentence['text']}")
+
+@task
+def list_entities(c, entity_type=None, name_prefix=None, state=None, sort=None, limit=None, ndjson=False, batch_size=1000):
+    """List entities, streamed from the database
+
+    Filter by type, name prefix or a possible state. Sorted by type then name
+    unless a type is given or --sort name is passed.
+
+    Example:
+        invoke list-entities --entity-type character --state Angry --ndjson
+    """
+    init_db()
+    import json
+    from project_muse.template.bulk import parse_entity_type
+    from project_muse.template.query import iter_entities
+    from project_muse.template.states import vocabulary
 
+    entity_type = parse_entity_type(entity_type) if entity_type else None
+    entities = iter_entities(
+        entity_type=entity_type,
+        name_prefix=name_prefix,
+        state=state,
+        sort=sort or ('name' if entity_type else 'type'),
+        limit=int(limit) if limit else None,
+        batch_size=int(batch_size),
+    )
+    current_type = None
     for entity in entities:
-        print(f"- {entity.name}: {entity.description}")
+        entity['possible_states'] = vocabulary.get_names(entity.get('possible_states', []))
+        if ndjson:
+            print(json.dumps(entity))
+            continue
+        if entity_type is None and sort is None and entity['entity_type'] != current_type:
+            current_type = entity['entity_type']
+            print(f"\n{current_type}:")
+        print(f"- {entity['name']}: {entity.get('description', '')}")
+
+@task
+def generate_scenes(c, output_file=None, templates_file=None, entities_file=None, entity_type=None,
+                    scenes=1, seed=None, workers=None, chunk_size=64):
+    """Fill scene templates offline across a process pool, writing scenes as NDJSON
+
+    Templates and entities are read from the database unless a file is given,
+    either NDJSON (as written by list-templates / list-entities --ndjson) or
+    an export-db backup. Scenes go to stdout unless --output-file is given.
+
+    Example:
+        invoke generate-scenes --scenes 10 --seed 1 --output-file scenes.ndjson
+    """
+    import sys
+    from project_muse.template.bulk import parse_entity_type
+    from project_muse.scene.generate import generate_scenes as generate, iter_template_documents, load_catalog
+
+    if templates_file is None or entities_file is None:
+        init_db()
+    catalog = load_catalog(entities_file)
+    documents = iter_template_documents(
+        templates_file, entity_type=parse_entity_type(entity_type) if entity_type else None
+    )
+    output = open(output_file, 'w') if output_file else sys.stdout
+    try:
+        stats = generate(
+            documents, catalog, output,
+            scenes=int(scenes),
+            seed=int(seed) if seed is not None else None,
+            workers=int(workers) if workers else None,
+            chunk_size=int(chunk_size),
+        )
+    finally:
+        if output_file:
+            output.close()
+    print(
+        f"Generated {stats.scenes} scenes from {stats.templates} templates, "
+        f"{stats.skipped} templates could not be filled",
+        file=sys.stderr,
+    )
+
+@task
+def ensure_indexes(c, audit=False):
+    """Create all declared indexes, and with --audit explain every known query shape
+
+    The audit fails if any query shape is planned as a collection scan.
+    """
+    init_db()
+    from project_muse.indexes import ensure_indexes as create_indexes, audit_query_plans
+
+    for collection, indexes in create_indexes().items():
+        print(f"{collection}: {', '.join(indexes)}")
+    if not audit:
+        return
+
+    plans = audit_query_plans()
+    print()
+    for plan in plans:
+        print(plan)
+    scans = [plan for plan in plans if plan.collection_scan]
+    if scans:
+        raise Exit(f"{len(scans)} query shapes use a collection scan", code=1)
 
 @task
 def game(c):
@@ -109,6 +278,29 @@ def editor(c):
     init_db()
     c.run("streamlit run editor.py")
 
+@task
+def api(c, host="127.0.0.1", port=8000):
+    """Run the headless game API"""
+    c.run(f"uvicorn app.api:app --host {host} --port {port}")
+
+@task
+def load_test(c, players=10, rounds=20, seed=None, output_file=None):
+    """Simulate concurrent players and report latency percentiles as JSON
+
+    Example:
+        invoke load-test --players 100 --rounds 50 --output-file load.json
+    """
+    init_db()
+    import json
+    from app.loadtest import run_load_test
+
+    report = run_load_test(int(players), int(rounds), int(seed) if seed is not None else None)
+    output = json.dumps(report, indent=2)
+    if output_file:
+        with open(output_file, 'w') as f:
+            f.write(output)
+    print(output)
+
 @task
 def export_db(c, output_file="db_backup.json"):
     """Export the entire database to a JSON file
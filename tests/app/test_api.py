@@ -0,0 +1,78 @@
+import mongomock
+import pytest
+from mongoengine import disconnect
+from starlette.testclient import TestClient
+from app.api import create_app
+from project_muse.db import init_db
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate
+from project_muse.types import EntityType
+
+@pytest.fixture
+def client():
+    """API client over a small catalog, served from an in-memory stand-in for Mongo"""
+    def connect():
+        init_db(mongo_client_class=mongomock.MongoClient)
+
+    disconnect()
+    connect()
+    SceneTemplate(name="Field").save().add_sentence("{character:One} waves at {character:Two}.")
+    for name in ("Jane", "John"):
+        EntityTemplate(name=name, entity_type=EntityType.CHARACTER).save()
+    EntityTemplate(name="Cow", entity_type=EntityType.CREATURE).save()
+
+    with TestClient(create_app(connect=connect)) as client:
+        yield client
+    disconnect()
+
+def create_session(client) -> str:
+    response = client.post("/sessions", json={'template': "Field"})
+    assert response.status_code == 201
+    return response.json()['session_id']
+
+class TestApi:
+    def test_templates(self, client):
+        templates = client.get("/templates").json()
+        assert [t['name'] for t in templates] == ["Field"]
+        assert templates[0]['sentences'][0]['tags'] == ["character:One", "character:Two"]
+        assert client.get("/templates/Missing").status_code == 404
+
+    def test_selection_flow(self, client):
+        session_id = create_session(client)
+        options = client.get(f"/sessions/{session_id}/options/One").json()
+        assert [e['name'] for e in options] == ["Jane", "John"]
+
+        state = client.put(f"/sessions/{session_id}/selections/One", json={'entity': "Jane"}).json()
+        assert state['selections'] == {'One': "Jane"}
+        assert state['preview'] == "Jane waves at {character:Two}."
+
+        options = client.get(f"/sessions/{session_id}/options/Two").json()
+        assert [e['name'] for e in options] == ["John"]
+
+        # Replacing a selection frees the old entity
+        client.put(f"/sessions/{session_id}/selections/One", json={'entity': "John"})
+        state = client.put(f"/sessions/{session_id}/selections/Two", json={'entity': "Jane"}).json()
+        assert state['preview'] == "John waves at Jane."
+
+        state = client.delete(f"/sessions/{session_id}/selections/Two").json()
+        assert state['selections'] == {'One': "John"}
+
+    def test_selection_errors(self, client):
+        session_id = create_session(client)
+        client.put(f"/sessions/{session_id}/selections/One", json={'entity': "Jane"})
+        assert client.put(f"/sessions/{session_id}/selections/Two", json={'entity': "Jane"}).status_code == 409
+        assert client.put(f"/sessions/{session_id}/selections/Two", json={'entity': "Cow"}).status_code == 400
+        assert client.put(f"/sessions/{session_id}/selections/Two", json={'entity': "Nope"}).status_code == 404
+        assert client.put(f"/sessions/{session_id}/selections/Three", json={'entity': "John"}).status_code == 404
+        assert client.get("/sessions/unknown").status_code == 404
+
+    def test_body_must_be_an_object(self, client):
+        assert client.post("/sessions", content=b"not json").status_code == 400
+        assert client.post("/sessions", json=["Field"]).status_code == 400
+        session_id = create_session(client)
+        assert client.put(f"/sessions/{session_id}/selections/One", json="Jane").status_code == 400
+
+    def test_delete_session(self, client):
+        session_id = create_session(client)
+        assert client.delete(f"/sessions/{session_id}").status_code == 204
+        assert client.get(f"/sessions/{session_id}").status_code == 404
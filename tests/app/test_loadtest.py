@@ -0,0 +1,45 @@
+import pytest
+from app.loadtest import percentile, run_load_test, summarize
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate
+from project_muse.types import EntityType
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Clean up templates and entities around each test"""
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+    yield
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+
+class TestSummary:
+    def test_percentile(self):
+        ordered = [float(i) for i in range(1, 101)]
+        assert percentile(ordered, 50) == 50.0
+        assert percentile(ordered, 99) == 99.0
+        assert percentile([3.0], 95) == 3.0
+        assert percentile([], 50) == 0.0
+
+    def test_summarize(self):
+        summary = summarize({'op': [0.001, 0.002, 0.003, 0.004]}, elapsed=2.0)
+        assert summary['op']['count'] == 4
+        assert summary['op']['throughput'] == 2.0
+        assert summary['op']['p50_ms'] == pytest.approx(2.0)
+        assert summary['op']['max_ms'] == pytest.approx(4.0)
+
+class TestRunLoadTest:
+    def test_run(self):
+        SceneTemplate(name="Field").save().add_sentence("{character:One} waves at {character:Two}.")
+        for name in ("Jane", "John", "Jill"):
+            EntityTemplate(name=name, entity_type=EntityType.CHARACTER).save()
+
+        report = run_load_test(players=3, rounds=2, seed=1)
+        operations = report['operations']
+        assert operations['choose_template']['count'] == 6
+        assert operations['add_selection']['count'] == 12
+        assert {'p50_ms', 'p95_ms', 'p99_ms'} <= set(operations['get_filled_description'])
+
+    def test_no_templates(self):
+        with pytest.raises(ValueError):
+            run_load_test(players=1, rounds=1)
@@ -0,0 +1,122 @@
+import pytest
+from app.types import SelectionState, get_sentence_orders
+from project_muse.scene import Scene
+from project_muse.template import records
+from project_muse.template.migration import build_sentences
+from project_muse.template.records import LazyTemplate
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate, SceneTemplateSentence, SceneTemplateTag
+from project_muse.types import EntityType
+
+HERO = SceneTemplateTag(EntityType.CHARACTER, "Hero")
+VILLAIN = SceneTemplateTag(EntityType.CHARACTER, "Villain")
+JANE = EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER)
+JOHN = EntityTemplate(name="John", entity_type=EntityType.CHARACTER)
+MARY = EntityTemplate(name="Mary", entity_type=EntityType.CHARACTER)
+
+@pytest.fixture
+def selection_state():
+    return SelectionState({}, {}, Scene(None))
+
+def selected(selection_state: SelectionState) -> dict[str, str]:
+    return {tag_name: entity.name for tag_name, (tag, entity) in selection_state.selections.items()}
+
+class TestSelectionState:
+    def test_undo_redo(self, selection_state):
+        selection_state.add_selection(HERO, JANE)
+        selection_state.add_selection(VILLAIN, JOHN)
+        selection_state.undo()
+        assert selected(selection_state) == {"Hero": "Jane"}
+        assert set(selection_state.used_entities["character"]) == {"Jane"}
+        assert [entity.entity.name for entity in selection_state.scene.entities] == ["Jane"]
+        selection_state.redo()
+        assert selected(selection_state) == {"Hero": "Jane", "Villain": "John"}
+
+    def test_clear_can_be_undone(self, selection_state):
+        selection_state.add_selection(HERO, JANE)
+        selection_state.clear()
+        assert selected(selection_state) == {}
+        selection_state.undo()
+        assert selected(selection_state) == {"Hero": "Jane"}
+
+    def test_batch_is_one_step(self, selection_state):
+        selection_state.add_selection(HERO, JANE)
+        with selection_state.batch():
+            selection_state.remove_selection("Hero")
+            selection_state.add_selection(HERO, JOHN)
+            selection_state.add_selection(VILLAIN, JANE)
+        selection_state.undo()
+        assert selected(selection_state) == {"Hero": "Jane"}
+
+    def test_snapshots_are_not_mutated(self, selection_state):
+        selection_state.add_selection(HERO, JANE)
+        snapshot = selection_state.snapshot()
+        selection_state.remove_selection("Hero")
+        assert "Hero" in snapshot[0]
+        assert "Jane" in snapshot[1]["character"]
+
+    def test_from_scene_has_no_history(self):
+        scene = Scene(None)
+        scene.create_entity_by_tag(HERO, JANE)
+        selection_state = SelectionState.from_scene(scene)
+        assert selected(selection_state) == {"Hero": "Jane"}
+        assert not selection_state.can_undo
+
+    def test_states_survive_undo(self):
+        scene = Scene(None)
+        scene.create_entity_by_tag(HERO, JANE, "Upset")
+        selection_state = SelectionState.from_scene(scene)
+        selection_state.add_selection(VILLAIN, JOHN)
+        selection_state.undo()
+        assert [(e.entity.name, e.state) for e in scene.entities] == [("Jane", "Upset")]
+        selection_state.clear()
+        selection_state.undo()
+        assert scene.entities[0].state == "Upset"
+
+    def test_replace_drops_downstream_selections(self):
+        template = SceneTemplate(name="Chase", sentences=[
+            SceneTemplateSentence(text="{character:Hero} runs.", order=0),
+            SceneTemplateSentence(text="{character:Villain} follows.", order=1),
+            SceneTemplateSentence(text="{character:Hero} hides from {character:Witness}.", order=2),
+        ])
+        orders = get_sentence_orders(template)
+        assert orders == {"Hero": 0, "Villain": 1, "Witness": 2}
+
+        witness = SceneTemplateTag(EntityType.CHARACTER, "Witness")
+        selection_state = SelectionState({}, {}, Scene(template))
+        selection_state.add_selection(VILLAIN, JANE)
+        selection_state.add_selection(witness, JANE)
+        selection_state.add_selection(HERO, JOHN)
+
+        # Witness comes after Villain and held the replaced entity, Hero comes before it
+        selection_state.replace_selection(VILLAIN, MARY, orders)
+        assert selected(selection_state) == {"Hero": "John", "Villain": "Mary"}
+        assert set(selection_state.used_entities["character"]) == {"John", "Mary"}
+        selection_state.undo()
+        assert selected(selection_state) == {"Villain": "Jane", "Witness": "Jane", "Hero": "John"}
+        assert set(selection_state.used_entities["character"]) == {"Jane", "John"}
+
+    def test_replace_frees_the_old_entity(self, selection_state):
+        selection_state.add_selection(HERO, JANE)
+        selection_state.replace_selection(HERO, JOHN, {})
+        assert selected(selection_state) == {"Hero": "John"}
+        assert set(selection_state.used_entities["character"]) == {"John"}
+
+    def test_lazy_sentence_orders_load_no_pages(self, monkeypatch):
+        SceneTemplate.objects(name="Saga").delete()
+        SceneTemplate(
+            name="Saga", sentences=build_sentences(" ".join(f"{{character:C{i}}} speaks." for i in range(200))),
+        ).save()
+        windows = []
+        get_sentence_window = records.get_sentence_window
+        monkeypatch.setattr(records, "get_sentence_window", lambda *args: windows.append(args) or get_sentence_window(*args))
+
+        template = LazyTemplate("Saga", page_size=10)
+        selection_state = SelectionState({}, {}, Scene(template))
+        first, last = SceneTemplateTag(EntityType.CHARACTER, "C0"), SceneTemplateTag(EntityType.CHARACTER, "C199")
+        selection_state.replace_selection(first, JANE, get_sentence_orders(template))
+        selection_state.replace_selection(last, JOHN, get_sentence_orders(template))
+        selection_state.replace_selection(first, JOHN, get_sentence_orders(template))
+        assert get_sentence_orders(template)["C199"] == 199
+        assert windows == []
+        SceneTemplate.objects(name="Saga").delete()
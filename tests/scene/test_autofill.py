@@ -0,0 +1,64 @@
+import pytest
+from project_muse.scene.autofill import AutoFill, tokenize, trigrams
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate, SceneTemplateSentence, SceneTemplateTag
+from project_muse.types import EntityType
+
+@pytest.fixture
+def autofill():
+    return AutoFill([
+        EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER, possible_states=["Angry"]),
+        EntityTemplate(name="Old Hero", entity_type=EntityType.CHARACTER, description="A retired knight"),
+        EntityTemplate(name="Heroine", entity_type=EntityType.CHARACTER),
+        EntityTemplate(name="John", entity_type=EntityType.CHARACTER, possible_states=["Neutral"]),
+        EntityTemplate(name="Cow", entity_type=EntityType.CREATURE, description="Cool looking cow"),
+        EntityTemplate(name="Horse", entity_type=EntityType.CREATURE),
+    ])
+
+class TestTokens:
+    def test_tokenize(self):
+        assert tokenize("Old Hero, the 2nd") == ["old", "hero", "the", "2nd"]
+
+    def test_trigrams(self):
+        assert trigrams("ab") == {"  a", " ab", "ab "}
+
+class TestAutoFill:
+    def test_rank_by_name(self, autofill):
+        ranked = autofill.rank(SceneTemplateTag(EntityType.CHARACTER, "hero"))
+        assert [e.name for e in ranked] == ["Old Hero", "Heroine", "Jane", "John"]
+
+    def test_rank_by_description_and_type(self, autofill):
+        ranked = autofill.rank(SceneTemplateTag(EntityType.CHARACTER, "knight"))
+        assert ranked[0].name == "Old Hero"
+        ranked = autofill.rank(SceneTemplateTag(EntityType.CREATURE, "cow"))
+        assert [e.name for e in ranked] == ["Cow", "Horse"]
+
+    def test_rank_exclude_limit_and_state(self, autofill):
+        tag = SceneTemplateTag(EntityType.CHARACTER, "X")
+        assert [e.name for e in autofill.rank(tag, exclude={"Jane"}, limit=2)] == ["Old Hero", "Heroine"]
+        assert autofill.rank(tag, state="neutral", limit=1)[0].name == "John"
+
+    def test_suggest_distinct_assignment(self, autofill):
+        template = SceneTemplate(name="Field", sentences=[
+            SceneTemplateSentence(text="{character:Hero} and {character:Sidekick} see a {creature:Cow}.", order=0),
+            SceneTemplateSentence(text="{character:Hero} waves.", order=1),
+        ])
+        assignment = autofill.suggest(template)
+        assert set(assignment) == {"character:Hero", "character:Sidekick", "creature:Cow"}
+        assert assignment["character:Hero"].name == "Old Hero"
+        assert assignment["creature:Cow"].name == "Cow"
+        assert assignment["character:Sidekick"].name != "Old Hero"
+
+    def test_suggest_keeps_selections(self, autofill):
+        template = SceneTemplate(name="Pair", sentences=[
+            SceneTemplateSentence(text="{character:Hero} meets {character:Friend}", order=0),
+        ])
+        assignment = autofill.suggest(template, selections={"character:Hero": "John"})
+        assert assignment["character:Hero"].name == "John"
+        assert assignment["character:Friend"].name != "John"
+
+    def test_suggest_not_enough_entities(self, autofill):
+        template = SceneTemplate(name="Herd", sentences=[
+            SceneTemplateSentence(text="{creature:a} {creature:b} {creature:c}", order=0),
+        ])
+        assert len(autofill.suggest(template)) == 2
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from project_muse.scene import Scene
+from project_muse.scene.batch import EMPTY, EntityCatalog, SceneBatch
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate, SceneTemplateSentence
+from project_muse.types import EntityType
+
+@pytest.fixture
+def catalog():
+    return EntityCatalog([
+        EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER, possible_states=["Neutral", "Upset"]),
+        EntityTemplate(name="John", entity_type=EntityType.CHARACTER, possible_states=["Neutral"]),
+        EntityTemplate(name="Jill", entity_type=EntityType.CHARACTER),
+        EntityTemplate(name="Cow", entity_type=EntityType.CREATURE, possible_states=["Grazing"]),
+    ])
+
+@pytest.fixture
+def scene_template():
+    return SceneTemplate(name="Field", sentences=[
+        SceneTemplateSentence(text="{character:One} waves at {character:Two}.", order=0),
+        SceneTemplateSentence(text="{creature:Cow} ignores {character:One}.", order=1),
+    ])
+
+class TestEntityCatalog:
+    def test_ids(self, catalog):
+        assert catalog.entity_ids["Cow"] == 3
+        assert catalog.states == ["Neutral", "Upset", "Grazing"]
+        assert catalog.state_mask[1].tolist() == [True, False, False]
+        assert catalog.get_ids_by_type(EntityType.CHARACTER).tolist() == [0, 1, 2]
+
+class TestSceneBatch:
+    def test_slots_are_distinct(self, scene_template, catalog):
+        batch = SceneBatch.empty(scene_template, catalog, 2)
+        assert [str(tag) for tag in batch.slots] == ["character:One", "character:Two", "creature:Cow"]
+        assert batch.entity_ids.shape == (2, 3)
+        assert not batch.is_complete().any()
+
+    def test_checks(self, scene_template, catalog):
+        batch = SceneBatch(scene_template, catalog, [
+            [0, 1, 3],      # valid
+            [0, 0, 3],      # repeated entity
+            [0, 3, 3],      # creature in a character slot
+            [2, EMPTY, 3],  # incomplete but valid
+        ])
+        assert batch.is_unique().tolist() == [True, False, False, True]
+        assert batch.is_type_valid().tolist() == [True, True, False, True]
+        assert batch.is_complete().tolist() == [True, True, True, False]
+        assert batch.is_valid().tolist() == [True, False, False, True]
+
+    def test_state_check(self, scene_template, catalog):
+        states = np.array([[1, EMPTY, 2], [1, 1, 2]])
+        batch = SceneBatch(scene_template, catalog, [[0, 1, 3], [0, 1, 3]], states)
+        # John cannot be Upset
+        assert batch.is_state_valid().tolist() == [True, False]
+
+    def test_sample(self, scene_template, catalog):
+        batch = SceneBatch.sample(scene_template, catalog, 1000, np.random.default_rng(0))
+        assert batch.is_complete().all()
+        assert batch.is_valid().all()
+
+    def test_sample_is_uniform(self, catalog):
+        scene_template = SceneTemplate(name="Pair", sentences=[
+            SceneTemplateSentence(text="{character:One} and {character:Two}", order=0),
+        ])
+        batch = SceneBatch.sample(scene_template, catalog, 6000, np.random.default_rng(0))
+        assert batch.is_valid().all()
+        # Each of the 6 ordered pairs of 3 characters is drawn about equally often
+        pairs, counts = np.unique(batch.entity_ids, axis=0, return_counts=True)
+        assert len(pairs) == 6
+        assert counts.min() > 850 and counts.max() < 1150
+
+    def test_sample_not_enough_entities(self, catalog):
+        scene_template = SceneTemplate(name="Herd", sentences=[
+            SceneTemplateSentence(text="{creature:Cow} and {creature:Horse}", order=0),
+        ])
+        batch = SceneBatch.sample(scene_template, catalog, 3)
+        assert not batch.filled().any()
+
+    def test_scene_round_trip(self, scene_template, catalog):
+        tags = {str(tag): tag for tag in scene_template.get_template_tags()}
+        scene = Scene(scene_template)
+        scene.create_entity_by_tag(tags["character:One"], catalog.entities[0], "Upset")
+        scene.create_entity_by_tag(tags["creature:Cow"], catalog.entities[3])
+
+        batch = SceneBatch.from_scenes([scene, Scene(scene_template)], catalog)
+        assert batch.entity_ids.tolist() == [[0, EMPTY, 3], [EMPTY, EMPTY, EMPTY]]
+        assert batch.state_ids[0, 0] == 1
+
+        restored = batch.to_scenes()[0]
+        assert [e.entity.name for e in restored.entities] == ["Jane", "Cow"]
+        assert restored.entities[0].state == "Upset"
+        assert restored.get_filled_description() == scene.get_filled_description()
+        assert batch.equals(SceneBatch.from_scenes(batch.to_scenes(), catalog)).all()
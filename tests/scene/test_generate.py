@@ -0,0 +1,98 @@
+import io
+import json
+import pytest
+from project_muse.scene.generate import (
+    fill_template, generate_scenes, get_tag_keys, iter_template_documents, load_catalog,
+)
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate
+from project_muse.types import EntityType
+
+CATALOG = {
+    'character': ("Jane", "John", "Jill"),
+    'creature': ("Cow",),
+}
+
+def template_document(name: str, *texts: str) -> dict:
+    return {'name': name, 'sentences': [{'text': text, 'order': order} for order, text in enumerate(texts)]}
+
+FIELD = template_document("Field", "{character:One} waves at {character:Two}.", "{creature:Pet} moos at {character:One}.")
+
+class TestFillTemplate:
+    def test_fills_distinct_entities(self):
+        (scene,) = fill_template(FIELD, CATALOG, seed=1)
+        entities = scene['entities']
+        assert set(entities) == {"character:One", "character:Two", "creature:Pet"}
+        assert entities["character:One"] != entities["character:Two"]
+        assert scene['description'] == (
+            f"{entities['character:One']} waves at {entities['character:Two']}.\n"
+            f"Cow moos at {entities['character:One']}."
+        )
+
+    def test_seeded(self):
+        assert fill_template(FIELD, CATALOG, scenes=3, seed=1) == fill_template(FIELD, CATALOG, scenes=3, seed=1)
+
+    def test_unseeded(self):
+        runs = {
+            tuple(scene['entities']["character:One"] for scene in fill_template(FIELD, CATALOG, scenes=20))
+            for _ in range(5)
+        }
+        assert len(runs) > 1
+
+    def test_legacy_description(self):
+        document = {'name': "Old", 'template_description': "{character:One} waves. {creature:Pet} moos."}
+        (scene,) = fill_template(document, CATALOG, seed=1)
+        assert scene['description'] == f"{scene['entities']['character:One']} waves.\nCow moos."
+
+    def test_unfillable(self):
+        document = template_document("Herd", "{creature:A} and {creature:B}.")
+        assert fill_template(document, CATALOG) == []
+
+    def test_uses_stored_tag_keys(self):
+        assert get_tag_keys({**FIELD, 'tag_keys': ["character:X"]}) == ["character:X"]
+        assert get_tag_keys(FIELD) == ["character:One", "character:Two", "creature:Pet"]
+
+class TestGenerateScenes:
+    def test_writes_ndjson_in_order(self):
+        documents = [template_document(f"T{i}", "{character:A} meets {character:B}.") for i in range(50)]
+        documents.append(template_document("Herd", "{creature:A} and {creature:B}."))
+        documents.append({'name': "Blank", 'template_description': ""})
+        output = io.StringIO()
+        stats = generate_scenes(documents, CATALOG, output, scenes=2, seed=1, workers=2, chunk_size=4, max_pending=2)
+
+        scenes = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert stats.to_dict() == {'templates': 52, 'scenes': 100, 'skipped': 2}
+        assert [scene['template'] for scene in scenes[::2]] == [f"T{i}" for i in range(50)]
+        assert scenes[0] == fill_template(documents[0], CATALOG, scenes=2, seed=1)[0]
+
+class TestSources:
+    def test_files(self, tmp_path):
+        templates = tmp_path / "templates.ndjson"
+        templates.write_text("\n".join(json.dumps(document) for document in (
+            FIELD, template_document("Empty", "Nothing here."),
+        )))
+        backup = tmp_path / "backup.json"
+        backup.write_text(json.dumps({
+            'scene_templates': [FIELD],
+            'characters': [{'name': "Jane"}],
+            'creatures': [{'name': "Cow", 'entity_type': "creature"}],
+        }))
+
+        assert [document['name'] for document in iter_template_documents(str(templates))] == ["Field", "Empty"]
+        assert [
+            document['name'] for document in iter_template_documents(str(templates), EntityType.CREATURE)
+        ] == ["Field"]
+        assert [document['name'] for document in iter_template_documents(str(backup))] == ["Field"]
+        assert load_catalog(str(backup)) == {'character': ("Jane",), 'creature': ("Cow",)}
+
+    def test_database(self):
+        SceneTemplate.objects.delete()
+        EntityTemplate.objects.delete()
+        SceneTemplate(name="Field").save().add_sentence("{character:One} waves.")
+        EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER).save()
+
+        (document,) = iter_template_documents()
+        assert document['tag_keys'] == ["character:One"]
+        assert load_catalog() == {'character': ("Jane",)}
+        SceneTemplate.objects.delete()
+        EntityTemplate.objects.delete()
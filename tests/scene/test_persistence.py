@@ -0,0 +1,84 @@
+import pytest
+from project_muse.scene import Scene
+from project_muse.scene.persistence import SceneRecord, SceneStore
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate
+from project_muse.types import EntityType
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Clean up scene records, templates and entities around each test"""
+    for document in (SceneRecord, SceneTemplate, EntityTemplate):
+        document.objects.delete()
+    yield
+    for document in (SceneRecord, SceneTemplate, EntityTemplate):
+        document.objects.delete()
+
+@pytest.fixture
+def scene():
+    template = SceneTemplate(name="Field").save()
+    template.add_sentence("{character:One} waves at {creature:Cow}.")
+    jane = EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER).save()
+    cow = EntityTemplate(name="Cow", entity_type=EntityType.CREATURE).save()
+
+    scene = Scene(template)
+    one, cow_tag = template.get_template_tags()
+    scene.create_entity_by_tag(one, jane, "Neutral")
+    scene.create_entity_by_tag(cow_tag, cow)
+    return scene
+
+class TestSceneStore:
+    def test_put_does_not_write(self, scene):
+        store = SceneStore()
+        store.put("player", scene)
+        assert SceneRecord.objects.count() == 0
+        assert store.get("player")['template_name'] == "Field"
+
+    def test_puts_coalesce(self, scene):
+        store = SceneStore()
+        store.put("player", Scene(scene.scene_template))
+        store.put("player", scene)
+        store.put("other", scene)
+        assert store.pending_count == 2
+        assert store.flush() == 2
+        assert store.pending_count == 0
+        assert len(SceneRecord._get_collection().find_one({'_id': "player"})['entities']) == 2
+
+    def test_close_flushes(self, scene):
+        store = SceneStore(flush_interval=60).start()
+        store.put("player", scene)
+        store.close()
+        assert SceneRecord.objects.count() == 1
+
+    def test_load_scene(self, scene):
+        store = SceneStore()
+        store.put("player", scene)
+        store.flush()
+
+        restored = store.load_scene("player")
+        assert restored.scene_template.name == "Field"
+        assert [e.entity.name for e in restored.entities] == ["Jane", "Cow"]
+        assert restored.entities[0].state == "Neutral"
+        assert restored.get_filled_description() == "Jane waves at Cow."
+
+    def test_load_missing(self):
+        assert SceneStore().load_scene("nobody") is None
+
+    def test_failed_flush_is_logged_and_requeued(self, scene, monkeypatch, caplog):
+        store = SceneStore(flush_interval=0.01)
+        store.put("player", scene)
+        collection = SceneRecord._get_collection()
+
+        def fail(*args, **kwargs):
+            raise ConnectionError("down")
+
+        monkeypatch.setattr(type(collection), "bulk_write", fail)
+        store.start()
+        while not caplog.records:
+            store._stopped.wait(0.01)
+        assert "snapshots requeued" in caplog.records[0].getMessage()
+        assert store.pending_count == 1
+
+        monkeypatch.undo()
+        store.close()
+        assert SceneRecord.objects.count() == 1
@@ -0,0 +1,91 @@
+import random
+import pytest
+from project_muse.scene.history import History
+from project_muse.scene.persistent import PersistentMap, PersistentSet
+
+class CollidingKey:
+    """Distinct keys sharing one hash"""
+    def __init__(self, name: str):
+        self.name = name
+
+    def __hash__(self):
+        return 42
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.name == self.name
+
+class TestPersistentMap:
+    def test_set_keeps_old_version(self):
+        first = PersistentMap().set("a", 1)
+        second = first.set("b", 2)
+        assert dict(first.items()) == {"a": 1}
+        assert dict(second.items()) == {"a": 1, "b": 2}
+        assert len(first) == 1 and len(second) == 2
+
+    def test_set_same_value_is_noop(self):
+        value = object()
+        first = PersistentMap().set("a", value)
+        assert first.set("a", value) is first
+
+    def test_delete(self):
+        items = PersistentMap.from_items([("a", 1), ("b", 2)])
+        assert dict(items.delete("a").items()) == {"b": 2}
+        assert items.delete("missing") is items
+        assert "a" in items
+        with pytest.raises(KeyError):
+            items.delete("a")["a"]
+
+    def test_matches_dict(self):
+        rng = random.Random(0)
+        items, expected = PersistentMap(), {}
+        for _ in range(5000):
+            key = rng.randrange(2000)
+            if rng.random() < 0.3:
+                items = items.delete(key)
+                expected.pop(key, None)
+            else:
+                items = items.set(key, key * 2)
+                expected[key] = key * 2
+        assert len(items) == len(expected)
+        assert dict(items.items()) == expected
+        assert items == expected
+
+    def test_hash_collisions(self):
+        a, b, c = CollidingKey("a"), CollidingKey("b"), CollidingKey("c")
+        items = PersistentMap.from_items([(a, 1), (b, 2), (c, 3)])
+        assert [items[a], items[b], items[c]] == [1, 2, 3]
+        items = items.delete(b)
+        assert len(items) == 2 and b not in items and items[c] == 3
+
+class TestPersistentSet:
+    def test_add_discard(self):
+        names = PersistentSet(["Jane"])
+        more = names.add("John")
+        assert set(names) == {"Jane"}
+        assert set(more.discard("Jane")) == {"John"}
+        assert names.add("Jane") is names
+
+    def test_set_operators(self):
+        assert PersistentSet(["Jane", "John"]) - {"Jane"} == {"John"}
+
+class TestHistory:
+    def test_undo_redo(self):
+        history = History(0)
+        history.push(1)
+        history.push(2)
+        assert history.undo() == 1
+        assert history.undo() == 0
+        assert not history.can_undo
+        assert history.redo() == 1
+        history.push(3)
+        assert not history.can_redo
+        with pytest.raises(IndexError):
+            history.redo()
+
+    def test_limit(self):
+        history = History(0, limit=2)
+        for state in range(1, 6):
+            history.push(state)
+        assert history.undo() == 4
+        assert history.undo() == 3
+        assert not history.can_undo
@@ -0,0 +1,143 @@
+import io
+import pytest
+from project_muse.template.bulk import (
+    apply_entity_edits,
+    build_entity_update,
+    bulk_insert_entities,
+    bulk_insert_file,
+    decode_row,
+    diff_grid,
+    parse_entity_type,
+    read_rows,
+)
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.states import vocabulary
+from project_muse.types import EntityType
+
+CSV = """name,entity_type,description,possible_states
+Jane,character,A farmer,Neutral|Upset
+Cow,CREATURE,,
+Axe,object_prop,Sharp,
+,character,No name,
+Jane,character,Again,
+Tree,tree,Unknown type,
+"""
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Clean up entities around each test"""
+    EntityTemplate.objects.delete()
+    yield
+    EntityTemplate.objects.delete()
+
+class TestReadRows:
+    def test_csv(self):
+        rows = list(read_rows(io.StringIO(CSV), 'csv'))
+        assert len(rows) == 6
+        assert rows[0]['possible_states'] == "Neutral|Upset"
+
+    def test_ndjson(self):
+        data = '{"name": "Jane", "entity_type": "character"}\n\n{"name": "Cow", "entity_type": "creature"}\n'
+        assert [decode_row(row)['name'] for row in read_rows(io.StringIO(data), 'ndjson')] == ["Jane", "Cow"]
+
+    def test_unsupported(self):
+        with pytest.raises(ValueError):
+            list(read_rows(io.StringIO(""), 'xml'))
+
+    def test_parse_entity_type(self):
+        assert parse_entity_type("object_prop") == EntityType.OBJECT_PROP
+        assert parse_entity_type("LANDMARK") == EntityType.LANDMARK
+        with pytest.raises(ValueError):
+            parse_entity_type("tree")
+
+class TestBulkInsert:
+    def test_insert_with_errors(self):
+        result = bulk_insert_file(CSV.encode(), "entities.csv", batch_size=2)
+        assert result.inserted == 3
+        assert [error.row for error in result.errors] == [4, 5, 6]
+        assert result.errors[1].message == "Duplicate name in upload"
+
+        jane = EntityTemplate.objects(name="Jane").first()
+        assert jane.entity_type == EntityType.CHARACTER
+        assert jane.possible_states == ["Neutral", "Upset"]
+        assert EntityTemplate.objects(name="Cow").first().entity_type == EntityType.CREATURE
+
+    def test_malformed_ndjson(self):
+        data = "\n".join([
+            '{"name": "Jane", "entity_type": "character"}',
+            '{"name": "Broken"',
+            '["Cow", "creature"]',
+            '{"name": 7, "entity_type": "creature"}',
+            '{"name": "Cow", "entity_type": ["creature"]}',
+            '{"name": "Axe", "entity_type": "object", "possible_states": ["Sharp", 1]}',
+            '{"name": "John", "entity_type": "character", "description": null}',
+        ])
+        result = bulk_insert_file(data.encode(), "entities.ndjson")
+        assert result.inserted == 2
+        assert [(error.row, error.name) for error in result.errors] == [
+            (2, None), (3, None), (4, None), (5, "Cow"), (6, "Axe"),
+        ]
+        assert result.errors[0].message.startswith("Invalid JSON")
+        assert result.errors[1].message == "Row must be an object"
+        assert result.errors[3].message == "entity_type must be a string"
+
+    def test_existing_names(self):
+        EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER).save()
+        result = bulk_insert_entities([
+            {'name': "Jane", 'entity_type': "character"},
+            {'name': "John", 'entity_type': "character", 'possible_states': ["Neutral"]},
+        ])
+        assert result.inserted == 1
+        assert result.errors[0].message == "Name already exists"
+        assert EntityTemplate.objects.count() == 2
+
+class TestApplyEntityEdits:
+    def test_build_update(self):
+        assert build_entity_update({'possible_states': "Neutral| Upset |", '_id': "ignored"}) == {
+            'possible_states': vocabulary.get_ids(["Neutral", "Upset"]),
+        }
+        with pytest.raises(ValueError):
+            build_entity_update({'name': " "})
+
+    def test_diff_grid(self):
+        original = [
+            {'_id': "a", 'name': "Jane", 'description': "Old"},
+            {'_id': "b", 'name': "John", 'description': "Old"},
+            {'_id': "c", 'name': "Jill", 'description': "Old"},
+        ]
+        # Jane deleted, so every row after her moves up one position
+        edited = [
+            {'_id': "b", 'name': "John", 'description': "New"},
+            {'_id': "c", 'name': "Jill", 'description': "Old"},
+            {'_id': None, 'name': "Jack", 'description': ""},
+        ]
+        changes = diff_grid(original, edited)
+        assert changes.edited == {"b": (1, {'description': "New"})}
+        assert changes.deleted == {"a": 1}
+        assert changes.added == [{'name': "Jack", 'description': ""}]
+        assert len(changes) == 3
+
+    def test_apply(self):
+        for name in ("Jane", "John", "Jill"):
+            EntityTemplate(name=name, entity_type=EntityType.CHARACTER, description="Old").save()
+        original = [
+            {'_id': str(EntityTemplate.objects(name=name).first().id), 'name': name, 'description': "Old"}
+            for name in ("Jane", "John", "Jill")
+        ]
+        edited = [
+            {**original[0], 'description': "New"},
+            {**original[1], 'name': ""},
+        ]
+
+        result = apply_entity_edits(diff_grid(original, edited))
+        assert (result.updated, result.deleted) == (1, 1)
+        assert [error.row for error in result.errors] == [2]
+
+        jane = EntityTemplate.objects(name="Jane").first()
+        assert jane.description == "New"
+        assert EntityTemplate.objects(name="John").first().description == "Old"
+        assert EntityTemplate.objects(name="Jill").first() is None
+
+    def test_no_changes(self):
+        result = apply_entity_edits(diff_grid([], []))
+        assert (result.updated, result.deleted, result.errors) == (0, 0, [])
@@ -0,0 +1,95 @@
+import pytest
+from project_muse.template import capacity
+from project_muse.template.capacity import count_assignments, get_capacity_report, get_entity_counts
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.scene import SceneTemplate
+from project_muse.types import EntityType
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Clean up templates and entities around each test"""
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+    yield
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+
+def add_entities(entity_type: EntityType, *names: str):
+    for name in names:
+        EntityTemplate(name=name, entity_type=entity_type).save()
+
+class TestCountAssignments:
+    def test_falling_permutation(self):
+        # 3 characters into 2 distinct slots, 2 creatures into 1 slot
+        assert count_assignments((2, 1), (3, 2)) == 3 * 2 * 2
+
+    def test_not_enough_entities(self):
+        assert count_assignments((3,), (2,)) == 0
+
+    def test_no_slots(self):
+        assert count_assignments((0, 0), (0, 5)) == 1
+
+class TestCapacityReport:
+    def test_entity_counts(self):
+        add_entities(EntityType.CHARACTER, "Jane", "John")
+        add_entities(EntityType.CREATURE, "Cow")
+        counts = get_entity_counts()
+        assert counts["character"] == 2
+        assert counts["creature"] == 1
+        assert counts["landmark"] == 0
+
+    def test_report(self):
+        add_entities(EntityType.CHARACTER, "Jane", "John", "Jill")
+        add_entities(EntityType.CREATURE, "Cow")
+        SceneTemplate(name="Field").save().add_sentence(
+            "{character:One} and {character:Two} watch {creature:Cow}. {character:One} waves."
+        )
+        SceneTemplate(name="Herd").save().add_sentence("{creature:Cow} and {creature:Horse}")
+
+        report = {capacity.name: capacity for capacity in get_capacity_report()}
+        assert report["Field"].slots["character"] == 2
+        assert report["Field"].assignments == 3 * 2 * 1
+        assert report["Field"].fillable
+        assert report["Herd"].assignments == 0
+        assert not report["Herd"].fillable
+
+    def test_unindexed_templates(self):
+        add_entities(EntityType.CHARACTER, "Jane")
+        SceneTemplate._get_collection().insert_one({'name': "Legacy", 'template_description': "{character:One} waves."})
+        SceneTemplate(name="Field").save().add_sentence("{character:One} waves.")
+
+        report = {capacity.name: capacity for capacity in get_capacity_report()}
+        assert report["Field"].fillable
+        assert not report["Legacy"].indexed
+        assert not report["Legacy"].fillable
+        assert report["Legacy"].to_dict()['indexed'] is False
+
+    def test_slots_are_not_shared(self):
+        add_entities(EntityType.CHARACTER, "Jane")
+        SceneTemplate(name="Field").save().add_sentence("{character:One} waves.")
+        SceneTemplate(name="Meadow").save().add_sentence("{character:Two} waves.")
+
+        field, meadow = get_capacity_report()
+        field.slots["character"] = 5
+        assert meadow.slots["character"] == 1
+        assert get_capacity_report()[0].slots["character"] == 1
+
+class TestReportCache:
+    def test_skips_aggregations_until_changed(self, monkeypatch):
+        add_entities(EntityType.CHARACTER, "Jane")
+        SceneTemplate(name="Field").save().add_sentence("{character:One} waves.")
+        first = get_capacity_report()
+
+        calls = []
+        original = capacity.get_slot_profiles
+        monkeypatch.setattr(capacity, 'get_slot_profiles', lambda: calls.append(1) or original())
+        assert get_capacity_report() == first
+        assert calls == []
+
+        SceneTemplate.objects(name="Field").first().update_sentence(0, "{character:One} waves at {character:Two}.")
+        assert not {c.name: c for c in get_capacity_report()}["Field"].fillable
+        assert calls == [1]
+
+        add_entities(EntityType.CHARACTER, "John")
+        assert {c.name: c for c in get_capacity_report()}["Field"].fillable
+        assert calls == [1, 1]
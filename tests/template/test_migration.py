@@ -0,0 +1,104 @@
+import pytest
+from project_muse.template.scene import SceneTemplate
+from project_muse.template.migration import (
+    MigrationCheckpoint,
+    TemplateDescriptionMigration,
+    build_sentences,
+    split_sentences,
+)
+
+LEGACY_DESCRIPTION = (
+    "{character:One} is holding a {object_prop:Axe}.  A {landmark:Tree} is behind him. "
+    "Is {creature:Cow} grazing?"
+)
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Clean up templates and checkpoints around each test"""
+    SceneTemplate.objects.delete()
+    MigrationCheckpoint.objects.delete()
+    yield
+    SceneTemplate.objects.delete()
+    MigrationCheckpoint.objects.delete()
+
+def insert_legacy(count: int):
+    collection = SceneTemplate._get_collection()
+    collection.insert_many([
+        {'name': f"Legacy {i}", 'template_description': LEGACY_DESCRIPTION}
+        for i in range(count)
+    ])
+
+class TestSplitSentences:
+    def test_split(self):
+        assert split_sentences(LEGACY_DESCRIPTION) == [
+            "{character:One} is holding a {object_prop:Axe}.",
+            "A {landmark:Tree} is behind him.",
+            "Is {creature:Cow} grazing?",
+        ]
+
+    def test_unterminated_last_sentence(self):
+        assert split_sentences("First. Second") == ["First.", "Second"]
+
+    def test_line_breaks_end_sentences(self):
+        description = "{character:One} waves\nNobody answers.\n\nThe end"
+        assert split_sentences(description) == ["{character:One} waves", "Nobody answers.", "The end"]
+
+    def test_tags_are_never_split(self):
+        assert split_sentences("{character:Dr. Who} arrives. He leaves!") == [
+            "{character:Dr. Who} arrives.", "He leaves!",
+        ]
+        assert split_sentences("An open { brace. Ends") == ["An open { brace.", "Ends"]
+
+    def test_full_description_round_trips(self):
+        sentences = ["{character:One} waves", "Nobody answers", "Is {creature:Cow} there?"]
+        assert split_sentences("\n".join(sentences)) == sentences
+
+    def test_empty(self):
+        assert split_sentences("") == []
+        assert split_sentences(" ... ") == []
+
+    def test_build_sentences_order(self):
+        sentences = build_sentences(LEGACY_DESCRIPTION)
+        assert [s.order for s in sentences] == [0, 1, 2]
+        assert [tag.tag_name for tag in sentences[0].template_tags] == ["One", "Axe"]
+
+class TestTemplateDescriptionMigration:
+    def test_run(self):
+        insert_legacy(5)
+        stats = TemplateDescriptionMigration(batch_size=2).run()
+        assert stats.scanned == 5
+        assert stats.migrated == 5
+        assert stats.batches == 3
+
+        template = SceneTemplate.objects(name="Legacy 0").first()
+        assert len(template.sentences) == 3
+        assert template.sentences[2].text == "Is {creature:Cow} grazing?"
+        raw = SceneTemplate._get_collection().find_one({'name': "Legacy 0"})
+        assert 'template_description' not in raw
+        assert raw['tag_counts']['character'] == 1
+        assert "creature:Cow" in raw['tag_keys']
+
+    def test_dry_run_does_not_write(self):
+        insert_legacy(3)
+        stats = TemplateDescriptionMigration(dry_run=True).run()
+        assert stats.scanned == 3
+        assert stats.docs_per_second > 0
+        assert SceneTemplate._get_collection().count_documents({'template_description': {'$exists': True}}) == 3
+        assert MigrationCheckpoint.objects.count() == 0
+
+    def test_resume_from_checkpoint(self):
+        insert_legacy(4)
+        migration = TemplateDescriptionMigration(batch_size=2)
+        assert migration.run(limit=2).migrated == 2
+        assert migration.get_checkpoint().migrated == 2
+
+        stats = migration.run()
+        assert stats.scanned == 2
+        assert migration.get_checkpoint().migrated == 4
+
+    def test_reset(self):
+        insert_legacy(1)
+        migration = TemplateDescriptionMigration()
+        migration.run()
+        migration.reset()
+        assert migration.get_checkpoint().last_id is None
@@ -0,0 +1,62 @@
+import pytest
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.query import (
+    get_sentence_count, get_sentence_window, get_stored_tag_index, iter_entities, iter_templates,
+)
+from project_muse.template.scene import SceneTemplate
+from project_muse.types import EntityType
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Seed a few templates and entities"""
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+    EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER, possible_states=["Neutral", "Angry"]).save()
+    EntityTemplate(name="John", entity_type=EntityType.CHARACTER, possible_states=["Neutral"]).save()
+    EntityTemplate(name="Jam", entity_type=EntityType.OBJECT_PROP).save()
+    EntityTemplate(name="Cow", entity_type=EntityType.CREATURE).save()
+    SceneTemplate(name="Field").save().add_sentence("{character:One} sees {creature:Cow}")
+    SceneTemplate(name="Kitchen").save().add_sentence("{character:One} eats {object_prop:Jam}")
+    yield
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+
+class TestIterEntities:
+    def test_all_sorted_by_type(self):
+        entities = list(iter_entities(sort='type'))
+        assert [e['name'] for e in entities] == ["Jane", "John", "Cow", "Jam"]
+        assert set(entities[0]) == {'name', 'entity_type', 'description', 'possible_states'}
+
+    def test_filters(self):
+        assert [e['name'] for e in iter_entities(entity_type=EntityType.CHARACTER)] == ["Jane", "John"]
+        assert [e['name'] for e in iter_entities(name_prefix="Ja")] == ["Jam", "Jane"]
+        assert [e['name'] for e in iter_entities(state="Angry")] == ["Jane"]
+        assert [e['name'] for e in iter_entities(limit=1)] == ["Cow"]
+
+    def test_prefix_is_escaped(self):
+        assert list(iter_entities(name_prefix=".*")) == []
+
+    def test_unknown_sort(self):
+        with pytest.raises(ValueError):
+            iter_entities(sort='description')
+
+class TestIterTemplates:
+    def test_all(self):
+        templates = list(iter_templates())
+        assert [t['name'] for t in templates] == ["Field", "Kitchen"]
+        assert templates[0]['sentences'][0]['text'] == "{character:One} sees {creature:Cow}"
+
+    def test_by_entity_type(self):
+        assert [t['name'] for t in iter_templates(entity_type=EntityType.CREATURE)] == ["Field"]
+        assert [t['name'] for t in iter_templates(name_prefix="Kit")] == ["Kitchen"]
+
+class TestSentenceWindow:
+    def test_window(self):
+        SceneTemplate.objects(name="Field").first().add_sentence("{character:One} leaves.")
+        assert get_sentence_count("Field") == 2
+        assert get_sentence_count("Missing") is None
+        assert [s['text'] for s in get_sentence_window("Field", 1, 5)] == ["{character:One} leaves."]
+        assert get_sentence_window("Missing", 0, 5) == []
+        template = SceneTemplate.objects(name="Field").first()
+        assert get_stored_tag_index("Field") == (template.tag_keys, template.tag_orders)
+        assert get_stored_tag_index("Missing") == ([], [])
@@ -0,0 +1,117 @@
+import dataclasses
+import pytest
+from project_muse.scene import Scene
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.migration import build_sentences
+from project_muse.template.records import (
+    EntityRecord, LazyTemplate, TemplateRecord, as_records, load_entity_records, load_template_records,
+)
+from project_muse.template.scene import SceneTemplate, SceneTemplateTag
+from project_muse.types import EntityType
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Seed a template and a few entities"""
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+    EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER, description="Hero", possible_states=["Angry"]).save()
+    EntityTemplate(name="Cow", entity_type=EntityType.CREATURE).save()
+    template = SceneTemplate(name="Field").save()
+    template.add_sentence("{character:One} sees {creature:Cow}.")
+    template.add_sentence("{character:One} waves.")
+    yield
+    SceneTemplate.objects.delete()
+    EntityTemplate.objects.delete()
+
+class TestEntityRecords:
+    def test_load(self):
+        jane, = load_entity_records(EntityType.CHARACTER)
+        assert jane == EntityRecord("Jane", EntityType.CHARACTER, "Hero", ("Angry",))
+        assert str(jane) == str(EntityTemplate.objects(name="Jane").first())
+        assert [entity.name for entity in load_entity_records()] == ["Cow", "Jane"]
+
+    def test_projection(self):
+        jane, = as_records(EntityTemplate.objects(name="Jane"), 'name', 'entity_type')
+        assert jane == EntityRecord("Jane", EntityType.CHARACTER)
+
+    def test_immutable(self):
+        jane = load_entity_records(EntityType.CHARACTER)[0]
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            jane.name = "Jill"
+        assert not hasattr(jane, '__dict__')
+
+class TestTemplateRecords:
+    def test_matches_document(self):
+        record, = load_template_records()
+        document = SceneTemplate.objects(name="Field").first()
+        assert isinstance(record, TemplateRecord)
+        assert record.get_full_template_description() == document.get_full_template_description()
+        assert [str(tag) for tag in record.get_template_tags()] == [str(tag) for tag in document.get_template_tags()]
+        assert list(record.get_tags_by_sentence()) == [0, 1]
+
+    def test_backs_a_scene(self):
+        record, = load_template_records()
+        jane, = load_entity_records(EntityType.CHARACTER)
+        scene = Scene(record)
+        scene.create_entity_by_tag(record.get_template_tags()[0], jane)
+        assert scene.get_filled_description() == "Jane sees {creature:Cow}.\nJane waves."
+
+class TestLazyTemplate:
+    @pytest.fixture
+    def chapter(self):
+        SceneTemplate(
+            name="Chapter",
+            sentences=build_sentences(" ".join(f"{{character:C{i}}} speaks." for i in range(25))),
+        ).save()
+
+    def test_counts_without_loading(self, chapter):
+        template = LazyTemplate("Chapter", page_size=10)
+        assert len(template) == 25 and template.page_count == 3
+        assert template._pages == {}
+        with pytest.raises(ValueError):
+            LazyTemplate("Missing")
+
+    def test_windows(self, chapter):
+        template = LazyTemplate("Chapter", page_size=10, max_pages=2)
+        assert [s.order for s in template.get_window(8, 12)] == [8, 9, 10, 11]
+        assert set(template._pages) == {0, 1}
+        assert str(template.get_sentence_by_order(24)) == "{character:C24} speaks."
+        assert set(template._pages) == {1, 2}
+        assert list(template.get_tags_by_sentence(20, 30)) == [20, 21, 22, 23, 24]
+        assert template.get_window(30, 40) == []
+
+    def test_matches_document(self, chapter):
+        template = LazyTemplate("Chapter", page_size=10, max_pages=1)
+        document = SceneTemplate.objects(name="Chapter").first()
+        assert [s.order for s in template] == list(range(25))
+        assert template.get_full_template_description() == document.get_full_template_description()
+        assert [str(tag) for tag in template.get_template_tags()] == [str(tag) for tag in document.get_template_tags()]
+        assert len(template._pages) == 1
+
+    def test_tags_from_stored_keys(self, chapter):
+        template = LazyTemplate("Chapter", page_size=10)
+        tags = template.get_template_tags()
+        assert [str(tag) for tag in tags] == [f"character:C{i}" for i in range(25)]
+        assert tags[0].entity_type == EntityType.CHARACTER
+        assert template._pages == {}
+
+    def test_filled_window(self, chapter):
+        template = LazyTemplate("Chapter", page_size=10)
+        scene = Scene(template)
+        scene.create_entity_by_tag(SceneTemplateTag(EntityType.CHARACTER, "C11"), EntityTemplate(
+            name="Jane", entity_type=EntityType.CHARACTER,
+        ))
+        assert scene.get_filled_description(10, 12) == "{character:C10} speaks.\nJane speaks."
+        assert set(template._pages) == {1}
+
+    def test_tag_orders_from_stored_index(self, chapter):
+        template = LazyTemplate("Chapter", page_size=10)
+        document = SceneTemplate.objects(name="Chapter").first()
+        assert template.get_tag_orders() == document.get_tag_orders()
+        assert template.get_tag_orders()["character:C24"] == 24
+        assert template._pages == {}
+
+    def test_tag_orders_without_stored_orders(self, chapter):
+        SceneTemplate._get_collection().update_one({'name': "Chapter"}, {'$unset': {'tag_orders': ''}})
+        template = LazyTemplate("Chapter", page_size=10)
+        assert template.get_tag_orders()["character:C24"] == 24
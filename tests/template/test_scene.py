@@ -124,6 +124,112 @@ class TestSceneTemplate:
         assert len(tags_by_sentence[0]) == 2  # First sentence has 2 tags
         assert len(tags_by_sentence[1]) == 1  # Second sentence has 1 tag
 
+    def test_update_reparses_only_edited_sentence(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} found a {object_prop:sword}")
+        template.add_sentence("Near the {landmark:tree}")
+        template.add_sentence("A {creature:wolf} watched")
+        first_tags = template.get_tags_by_sentence()[0]
+        last_tags = template.get_tags_by_sentence()[2]
+
+        template.update_sentence(1, "Near the {landmark:tree} and {landmark:river}")
+        assert [tag.tag_name for tag in template.get_template_tags()] == [
+            "hero", "sword", "tree", "river", "wolf"
+        ]
+        assert template.get_tags_by_sentence()[0] is first_tags
+        assert template.get_tags_by_sentence()[2] is last_tags
+        assert len(template.get_tags_by_sentence()[1]) == 2
+
+    def test_direct_text_edit_invalidates_tags(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} waits")
+        template.add_sentence("Near the {landmark:tree}")
+        assert len(template.get_template_tags()) == 2
+
+        template.sentences[0].text = "Nobody waits"
+        assert [tag.tag_name for tag in template.get_template_tags()] == ["tree"]
+        assert template.get_tags_by_sentence()[0] == []
+
+    def test_add_sentence_extends_cached_tags(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} waits")
+        tags = template.get_template_tags()
+        template.add_sentence("Near the {landmark:tree}")
+        assert template.get_template_tags() is tags
+        assert [tag.tag_name for tag in tags] == ["hero", "tree"]
+
+    def test_replacing_sentences_rebuilds_tags(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} waits")
+        template.get_template_tags()
+        template.sentences = [SceneTemplateSentence(text="A {creature:wolf}", order=0)]
+        assert [tag.tag_name for tag in template.get_template_tags()] == ["wolf"]
+
+    def test_assigning_a_sentence_rebuilds_tags(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} waits")
+        template.add_sentence("Near the {landmark:tree}")
+        template.get_template_tags()
+
+        template.sentences[1] = SceneTemplateSentence(text="Under a {creature:bat}", order=1)
+        assert [tag.tag_name for tag in template.get_template_tags()] == ["hero", "bat"]
+        template.save()
+        assert template.tag_keys == ["character:hero", "creature:bat"]
+
+    def test_reordering_sentences_rebuilds_tags(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} waits")
+        template.add_sentence("Near the {landmark:tree}")
+        template.get_template_tags()
+
+        template.sentences.reverse()
+        assert [tag.tag_name for tag in template.get_template_tags()] == ["tree", "hero"]
+
+    def test_reads_rebuild_nothing(self, monkeypatch):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} waits")
+        template.get_template_tags()
+
+        monkeypatch.setattr(template, '_rebuild_tags', lambda: pytest.fail("rebuilt on read"))
+        template.get_template_tags()
+        template.get_tags_by_sentence()
+
+    def test_tag_index_on_save(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} found a {object_prop:sword}")
+        template.add_sentence("The {character:hero} met a {character:villain}")
+
+        assert template.tag_keys == ["character:hero", "object_prop:sword", "character:villain"]
+        assert template.tag_counts["character"] == 2
+        assert template.tag_counts["object_prop"] == 1
+        assert template.tag_counts["creature"] == 0
+        assert template.tag_orders == [0, 0, 1]
+
+    def test_tag_index_after_update(self):
+        template = SceneTemplate(name="Test Template").save()
+        template.add_sentence("The {character:hero} found a {object_prop:sword}")
+        template.update_sentence(0, "A {creature:wolf} appeared")
+        assert template.tag_keys == ["creature:wolf"]
+
+    def test_query_using_tag(self):
+        SceneTemplate(name="Forest").save().add_sentence("A {creature:wolf} and {character:hero}")
+        SceneTemplate(name="Town").save().add_sentence("The {character:hero} walks")
+
+        assert [t.name for t in SceneTemplate.objects.using_tag(EntityType.CREATURE)] == ["Forest"]
+        assert SceneTemplate.objects.using_tag(EntityType.CHARACTER, "hero").count() == 2
+        assert SceneTemplate.objects.using_tag(EntityType.CHARACTER, "villain").count() == 0
+
+    def test_query_requiring_at_most(self):
+        SceneTemplate(name="Crowd").save().add_sentence("{character:a} {character:b} {character:c}")
+        SceneTemplate(name="Pair").save().add_sentence("{character:a} and {character:b} see a {creature:cow}")
+        SceneTemplate(name="Herd").save().add_sentence("{creature:cow} and {creature:horse}")
+
+        templates = SceneTemplate.objects.requiring_at_most({
+            EntityType.CHARACTER: 2,
+            EntityType.CREATURE: 1,
+        })
+        assert sorted(t.name for t in templates) == ["Pair"]
+
     def test_str_representation(self):
         template = SceneTemplate(name="Test Template")
         assert str(template) == "Test Template"
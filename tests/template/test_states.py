@@ -0,0 +1,82 @@
+import pytest
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.migration import EntityStateMigration, MigrationCheckpoint
+from project_muse.template.query import load_state_matrix
+from project_muse.template.states import EntityState, StateMatrix, vocabulary
+from project_muse.types import EntityType
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    """Seed entities over a fresh state vocabulary"""
+    EntityTemplate.objects.delete()
+    EntityState.objects.delete()
+    MigrationCheckpoint.objects.delete()
+    vocabulary.clear()
+    EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER, possible_states=["Neutral", "Angry"]).save()
+    EntityTemplate(name="John", entity_type=EntityType.CHARACTER, possible_states=["Neutral"]).save()
+    EntityTemplate(name="Cow", entity_type=EntityType.CREATURE, possible_states=["Angry"]).save()
+    yield
+    EntityTemplate.objects.delete()
+    EntityState.objects.delete()
+    MigrationCheckpoint.objects.delete()
+    vocabulary.clear()
+
+class TestVocabulary:
+    def test_ids_are_shared(self):
+        assert vocabulary.get_ids(["Neutral", "Angry"]) == [0, 1]
+        assert EntityState.objects.count() == 2
+        assert vocabulary.get_id("Upset", create=False) is None
+
+    def test_reloads_after_clear(self):
+        vocabulary.clear()
+        assert vocabulary.get_name(1) == "Angry"
+        assert vocabulary.get_id("Confused") == 2
+
+class TestStateField:
+    def test_stored_as_ids(self):
+        document = EntityTemplate._get_collection().find_one({'name': "Jane"})
+        assert document['possible_states'] == [0, 1]
+        assert EntityTemplate.objects(name="Jane").first().possible_states == ["Neutral", "Angry"]
+
+    def test_supporting_state(self):
+        angry = EntityTemplate.objects.supporting_state(EntityType.CHARACTER, "Angry")
+        assert [entity.name for entity in angry] == ["Jane"]
+        assert EntityTemplate.objects.supporting_state(EntityType.CHARACTER, "Upset").count() == 0
+        assert EntityTemplate.objects(possible_states__in=["Angry", "Upset"]).count() == 2
+
+    def test_legacy_names_migrated(self):
+        EntityTemplate._get_collection().insert_one({
+            '_cls': 'EntityTemplate', 'name': "Jill", 'entity_type': "character", 'possible_states': ["Upset", "Angry"],
+        })
+        assert EntityTemplate.objects(name="Jill").first().possible_states == ["Upset", "Angry"]
+
+        stats = EntityStateMigration().run()
+        assert stats.migrated == 1
+        document = EntityTemplate._get_collection().find_one({'name': "Jill"})
+        assert document['possible_states'] == [vocabulary.get_id("Upset"), 1]
+        assert EntityStateMigration().run().scanned == 0
+
+    def test_dry_run_allocates_no_ids(self):
+        EntityTemplate._get_collection().insert_one({
+            '_cls': 'EntityTemplate', 'name': "Jill", 'entity_type': "character", 'possible_states': ["Upset"],
+        })
+        assert EntityStateMigration(dry_run=True).run().scanned == 1
+        assert EntityState.objects.count() == 2
+        assert vocabulary.get_id("Upset", create=False) is None
+
+class TestStateMatrix:
+    def test_filter(self):
+        matrix = load_state_matrix()
+        assert len(matrix) == 3
+        assert matrix.filter(EntityType.CHARACTER, ["Angry"]) == ["Jane"]
+        assert matrix.filter(states=["Angry"]) == ["Jane", "Cow"]
+        assert matrix.filter(EntityType.CHARACTER, ["Neutral", "Angry"]) == ["Jane"]
+        assert matrix.filter(states=["Upset"]) == []
+        assert load_state_matrix(EntityType.CREATURE).filter() == ["Cow"]
+
+    def test_wide_vocabulary(self):
+        vocabulary.get_ids(f"State {i}" for i in range(20))
+        matrix = StateMatrix([{'name': "Bob", 'entity_type': "character", 'possible_states': ["State 19"]}])
+        assert matrix.bits.shape == (1, 3)
+        assert matrix.filter(states=["State 19"]) == ["Bob"]
+        assert matrix.filter(states=["State 18"]) == []
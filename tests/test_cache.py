@@ -0,0 +1,130 @@
+import time
+import pytest
+from project_muse.cache import DiskCache, ReadThroughCache
+from project_muse.template.records import EntityRecord
+from project_muse.template.entity import EntityTemplate
+from project_muse.template.states import vocabulary
+from project_muse.types import EntityType
+
+@pytest.fixture
+def disk(tmp_path):
+    disk = DiskCache(tmp_path / "cache.sqlite3")
+    yield disk
+    disk.close()
+
+@pytest.fixture
+def entities():
+    EntityTemplate.objects.delete()
+    EntityTemplate(name="Jane", entity_type=EntityType.CHARACTER).save()
+    EntityTemplate(name="Cow", entity_type=EntityType.CREATURE).save()
+    yield
+    EntityTemplate.objects.delete()
+
+class TestDiskCache:
+    def test_put_get(self, disk):
+        disk.put("entities", "all", b"value", "v1")
+        value, version, _ = disk.get("entities", "all")
+        assert (value, version) == (b"value", "v1")
+        assert disk.get("entities", "other") is None
+
+    def test_lru_eviction(self, tmp_path):
+        disk = DiskCache(tmp_path / "small.sqlite3", max_bytes=10)
+        disk.put("c", "a", b"12345", "v")
+        time.sleep(0.01)
+        disk.put("c", "b", b"12345", "v")
+        time.sleep(0.01)
+        disk.get("c", "a")  # a is now more recently used than b
+        disk.put("c", "c", b"12345", "v")
+        assert disk.get("c", "b") is None
+        assert disk.get("c", "a") is not None
+        assert disk.size == 10
+
+    def test_persists_across_instances(self, tmp_path):
+        DiskCache(tmp_path / "cache.sqlite3").put("c", "k", b"value", "v")
+        assert DiskCache(tmp_path / "cache.sqlite3").get("c", "k")[0] == b"value"
+
+class TestReadThroughCache:
+    def test_miss_then_hit(self, disk):
+        calls = []
+        cache = ReadThroughCache(disk)
+        loader = lambda: calls.append(1) or [{'name': "Jane"}]
+        assert cache.get("entities", "all", loader) == [{'name': "Jane"}]
+        assert cache.get("entities", "all", loader) == [{'name': "Jane"}]
+        assert len(calls) == 1
+
+    def test_stale_served_and_revalidated(self, disk):
+        cache = ReadThroughCache(disk, ttl=0)
+        cache.get("entities", "all", lambda: [{'name': "Jane"}])
+        assert cache.get("entities", "all", lambda: [{'name': "John"}]) == [{'name': "Jane"}]
+        cache.wait()
+        assert cache.get("entities", "all", lambda: [{'name': "John"}]) == [{'name': "John"}]
+
+    def test_first_read_revalidates_fresh_entries(self, disk, entities):
+        ReadThroughCache(disk).get_records(EntityTemplate)
+        ReadThroughCache(disk).get_entry_version(EntityTemplate)
+        EntityTemplate(name="John", entity_type=EntityType.CHARACTER).save()
+
+        # A restarted process serves the entry, then reloads it once however young it is
+        restarted = ReadThroughCache(DiskCache(disk.path))
+        version = restarted.get_entry_version(EntityTemplate)
+        restarted.wait()
+        assert restarted.get_entry_version(EntityTemplate) != version
+        assert len(restarted.get_records(EntityTemplate)) == 3
+
+        calls = []
+        restarted.get("entities", "all", lambda: [])
+        restarted.get("entities", "all", lambda: calls.append(1) or [])
+        restarted.wait()
+        assert calls == []
+
+    def test_get_documents(self, disk, entities):
+        cache = ReadThroughCache(disk)
+        characters = cache.get_documents(EntityTemplate, entity_type=EntityType.CHARACTER)
+        assert [entity.name for entity in characters] == ["Jane"]
+
+        # Served from disk even after the database changed
+        EntityTemplate.objects.delete()
+        restarted = ReadThroughCache(DiskCache(disk.path))
+        characters = restarted.get_documents(EntityTemplate, entity_type=EntityType.CHARACTER)
+        assert characters[0].entity_type == EntityType.CHARACTER
+        restarted.wait()
+
+        restarted.invalidate(EntityTemplate._get_collection_name())
+        assert restarted.get_documents(EntityTemplate, entity_type=EntityType.CHARACTER) == []
+
+    def test_get_records(self, disk, entities):
+        cache = ReadThroughCache(disk)
+        cache.get_documents(EntityTemplate, entity_type=EntityType.CHARACTER)
+        EntityTemplate.objects.delete()
+        # Shares the cached entry with get_documents
+        characters = cache.get_records(EntityTemplate, entity_type=EntityType.CHARACTER)
+        assert characters == [EntityRecord("Jane", EntityType.CHARACTER)]
+
+    def test_get_entry_version(self, disk, entities):
+        cache = ReadThroughCache(disk, ttl=0)
+        version = cache.get_entry_version(EntityTemplate)
+        assert cache.get_records(EntityTemplate)[0].name == "Jane"
+        cache.wait()
+        assert cache.get_entry_version(EntityTemplate) == version
+        cache.wait()
+
+        # A revalidation that finds new documents moves the version
+        EntityTemplate(name="John", entity_type=EntityType.CHARACTER).save()
+        cache.get_entry_version(EntityTemplate)
+        cache.wait()
+        assert cache.get_entry_version(EntityTemplate) != version
+
+    def test_cold_start_needs_no_vocabulary(self, disk, entities, monkeypatch):
+        EntityTemplate(name="John", entity_type=EntityType.CHARACTER, possible_states=["Upset"]).save()
+        ReadThroughCache(disk).get_records(EntityTemplate, name="John")
+
+        # A restarted process with Mongo unreachable
+        def unreachable():
+            raise ConnectionError("down")
+
+        vocabulary.clear()
+        monkeypatch.setattr(vocabulary, "load", unreachable)
+        restarted = ReadThroughCache(DiskCache(disk.path))
+        assert restarted.get_records(EntityTemplate, name="John")[0].possible_states == ("Upset",)
+        assert restarted.get_documents(EntityTemplate, name="John")[0].possible_states == ["Upset"]
+        restarted.wait()
@@ -0,0 +1,23 @@
+from project_muse.indexes import QueryPlan, audit_query_plans, ensure_indexes, get_plan_stages
+
+class TestIndexes:
+    def test_plan_stages(self):
+        plan = {
+            'stage': 'FETCH',
+            'inputStage': {
+                'stage': 'OR',
+                'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}],
+            },
+        }
+        assert get_plan_stages(plan) == ['FETCH', 'OR', 'IXSCAN', 'COLLSCAN']
+        assert QueryPlan("tasks", "query", get_plan_stages(plan)).collection_scan
+
+    def test_ensure_indexes(self):
+        indexes = ensure_indexes()
+        assert 'name_1' in indexes['scene_template']
+        assert 'entity_type_1_name_1' in indexes['entity_template']
+
+    def test_audit_has_no_collection_scans(self):
+        ensure_indexes()
+        scans = [str(plan) for plan in audit_query_plans() if plan.collection_scan]
+        assert scans == []